@@ -0,0 +1,62 @@
+# SMOP -- Simple Matlab/Octave to Python compiler
+# Copyright 2011-2016 Victor Leikehman
+"""
+Growth benchmark.
+
+Appends n elements, one at a time, to an empty matlabarray, as
+translated matlab code does, and prints the best time per append
+for increasing n, next to the time per store into a preallocated
+array:
+
+    x = [];  for i=1:n, x(i) = i; end
+    x = zeros(1,n);  for i=1:n, x(i) = i; end
+
+The time per append should not grow with n.
+
+    $ python bench/grow.py
+"""
+import os
+import sys
+import timeit
+import argparse
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+
+def append(n):
+    a = libsmop.matlabarray()
+    for i in range(1, n + 1):
+        a[i] = i
+    return a
+
+
+def store(n):
+    a = libsmop.zeros(1, n)
+    for i in range(1, n + 1):
+        a[i] = i
+    return a
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=3, help="number of runs")
+    parser.add_argument("--max", type=int, default=256000, help="largest n")
+    args = parser.parse_args()
+
+    assert libsmop.isequal(append(100), store(100))
+    n = 1000
+    while n <= args.max:
+        t = min(timeit.repeat(lambda: append(n), number=1, repeat=args.n))
+        u = min(timeit.repeat(lambda: store(n), number=1, repeat=args.n))
+        print("%8d %8.2f us/append %8.2f us/store" % (n, t / n * 1e6, u / n * 1e6))
+        n *= 4
+
+
+if __name__ == "__main__":
+    argv = sys.argv
+    sys.argv = argv[:1]  # smop.options parses sys.argv
+    from smop import libsmop
+
+    sys.argv = argv
+    main()
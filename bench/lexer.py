@@ -0,0 +1,55 @@
+# SMOP -- Simple Matlab/Octave to Python compiler
+# Copyright 2011-2016 Victor Leikehman
+"""
+Lexer benchmark.
+
+Tokenizes the example files with the PLY lexer and with
+lexer.fast, and prints the best time of each.
+
+    $ python bench/lexer.py
+"""
+import os
+import sys
+import glob
+import timeit
+import argparse
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+
+def tokenize(sources):
+    n = 0
+    for s in sources:
+        lx = lexer.new()
+        lx.input(s)
+        try:
+            for tok in lx:
+                n += 1
+        except SyntaxError:
+            pass
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=10, help="number of runs")
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(root, "examples", "*.m")))
+    files += sorted(glob.glob(os.path.join(root, "benchmark5", "*.m")))
+    sources = [open(f).read() for f in files]
+    for name, ply in [("ply", True), ("fast", False)]:
+        options.ply_lexer = ply
+        n = tokenize(sources)
+        t = min(timeit.repeat(lambda: tokenize(sources), number=1, repeat=args.n))
+        print("%-5s %6d tokens %8.2f ms %6.2f us/token" % (name, n, t * 1e3, t * 1e6 / n))
+
+
+if __name__ == "__main__":
+    argv = sys.argv
+    sys.argv = argv[:1]  # smop.options parses sys.argv
+    from smop import lexer, options
+
+    sys.argv = argv
+    main()
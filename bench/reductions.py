@@ -0,0 +1,88 @@
+# SMOP -- Simple Matlab/Octave to Python compiler
+# Copyright 2011-2016 Victor Leikehman
+"""
+Reductions benchmark.
+
+Reduces the columns of a random matrix, with a few NaNs in
+it, with the libsmop functions, and with python loops over
+the elements, as a translated matlab loop would, and prints
+the best time of each:
+
+    [m,i] = max(a)      for j ... for k ... if a(k,j) > m(j)
+    [m,i] = min(a)
+    s = sum(a)
+    s = mean(a)
+
+    $ python bench/reductions.py
+"""
+import os
+import sys
+import timeit
+import argparse
+
+import numpy as np
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+
+def loop_extremum(a, largest):
+    rows, cols = a.shape
+    m = [np.nan] * cols
+    ix = [1] * cols
+    for j in range(cols):
+        for k in range(rows):
+            v = a[k, j]
+            if v != v:
+                continue
+            if m[j] != m[j] or (v > m[j] if largest else v < m[j]):
+                m[j] = v
+                ix[j] = k + 1
+    return m, ix
+
+
+def loop_sum(a):
+    rows, cols = a.shape
+    s = [0.0] * cols
+    for j in range(cols):
+        for k in range(rows):
+            s[j] += a[k, j]
+    return s
+
+
+def loop_mean(a):
+    return [s / a.shape[0] for s in loop_sum(a)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=3, help="number of runs")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--cols", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((args.rows, args.cols))
+    x[rng.integers(0, args.rows, args.cols), np.arange(args.cols)] = np.nan
+    a = libsmop.matlabarray(x)
+    cases = [
+        ("max", lambda: libsmop.max(a, nargout=2), lambda: loop_extremum(x, True)),
+        ("min", lambda: libsmop.min(a, nargout=2), lambda: loop_extremum(x, False)),
+        ("sum", lambda: libsmop.sum(a), lambda: loop_sum(x)),
+        ("mean", lambda: libsmop.mean(a), lambda: loop_mean(x)),
+    ]
+    m, i = libsmop.max(a, nargout=2)
+    assert np.array_equal(np.asarray(i).ravel(), loop_extremum(x, True)[1])
+    for name, vector, loop in cases:
+        t = min(timeit.repeat(vector, number=1, repeat=args.n))
+        u = min(timeit.repeat(loop, number=1, repeat=args.n))
+        print("%-5s %10.3f ms %10.3f ms loop %8.0fx" % (name, t * 1e3, u * 1e3, u / t))
+
+
+if __name__ == "__main__":
+    argv = sys.argv
+    sys.argv = argv[:1]  # smop.options parses sys.argv
+    from smop import libsmop
+
+    sys.argv = argv
+    main()
@@ -0,0 +1,104 @@
+# SMOP -- Simple Matlab/Octave to Python compiler
+# Copyright 2011-2016 Victor Leikehman
+"""
+Name resolution scaling benchmark.
+
+Resolves synthetic functions of growing size, and prints the
+time and the total length of the def lists, which should both
+grow linearly:
+
+    loops   n nested for loops, each updating the same variables
+    elseif  a state machine: a while loop around an if/elseif
+            chain of n states, each assigning the state variables
+    nested  n nested if statements in a loop
+
+    $ python bench/resolve.py
+"""
+import os
+import sys
+import time
+import argparse
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+nvars = 10
+
+
+def assignments(indent, k):
+    return "".join(
+        "%sv%d = v%d + %d;\n" % (indent, j, (j + 1) % nvars, k) for j in range(nvars)
+    )
+
+
+def loops(n):
+    s = "function r = f(a)\n" + assignments("  ", 0)
+    for k in range(n):
+        s += "  " * (k + 1) + "for i%d = 1:a\n" % k
+        s += assignments("  " * (k + 2), k)
+    for k in reversed(range(n)):
+        s += "  " * (k + 1) + "end\n"
+    return s + "  r = v0;\nend\n"
+
+
+def elseif(n):
+    s = "function r = f(a)\n" + assignments("  ", 0)
+    s += "  state = 0;\n  while state >= 0\n"
+    for k in range(n):
+        s += "    %s state == %d\n" % ("if" if k == 0 else "elseif", k)
+        s += assignments("      ", k)
+        s += "      state = %d;\n" % (k + 1)
+    s += "    else\n      state = -1;\n    end\n  end\n  r = v0;\nend\n"
+    return s
+
+
+def nested(n):
+    s = "function r = f(a)\n" + assignments("  ", 0) + "  for i = 1:a\n"
+    for k in range(n):
+        s += "  " * (k + 2) + "if v%d > %d\n" % (k % nvars, k)
+        s += assignments("  " * (k + 3), k)
+    for k in reversed(range(n)):
+        s += "  " * (k + 2) + "end\n"
+    return s + "  end\n  r = v0;\nend\n"
+
+
+def measure(src):
+    t = parse.parse(src)
+    start = time.perf_counter()
+    resolve.resolve(t)
+    elapsed = time.perf_counter() - start
+    # entries of the distinct def lists, nested or not
+    seen = set()
+    stack = [u.defs for u in node.postorder(t) if u.__class__ is node.ident and u.defs]
+    ndefs = 0
+    while stack:
+        d = stack.pop()
+        if id(d) not in seen:
+            seen.add(id(d))
+            ndefs += len(d)
+            stack.extend(v for v in d if isinstance(v, list))
+    return elapsed, ndefs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=8, help="largest size, as a power of 2")
+    args = parser.parse_args()
+    sys.setrecursionlimit(100000)
+    for name, gen in [("loops", loops), ("elseif", elseif), ("nested", nested)]:
+        for e in range(1, args.n + 1):
+            # deeper loops are not realistic programs
+            n = 2 * e if name == "loops" else 2 ** e
+            elapsed, ndefs = measure(gen(n))
+            print("%-8s n=%-5d %10.2f ms %10d defs" % (name, n, elapsed * 1e3, ndefs))
+            if elapsed > 5:
+                break  # too slow to go on
+
+
+if __name__ == "__main__":
+    argv = sys.argv
+    sys.argv = argv[:1]  # smop.options parses sys.argv
+    from smop import node, parse, resolve
+
+    sys.argv = argv
+    main()
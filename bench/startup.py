@@ -0,0 +1,71 @@
+# SMOP -- Simple Matlab/Octave to Python compiler
+# Copyright 2011-2016 Victor Leikehman
+"""
+Startup time benchmark.
+
+Measures, in fresh interpreters, the time to import the
+parser and to translate one small file end to end, and,
+in this process, the cost of lexer.new().  Use --record to
+append the results to a JSON lines file and track them
+across versions:
+
+    $ python bench/startup.py --record bench/startup.jsonl
+"""
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+import subprocess
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+
+def run(args, n):
+    """Best wall time of n runs of the python interpreter with args"""
+    env = dict(os.environ, PYTHONPATH=root)
+    best = None
+    for i in range(n):
+        t = time.perf_counter()
+        subprocess.check_call(
+            [sys.executable, "-W", "ignore"] + args,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        t = time.perf_counter() - t
+        best = t if best is None else min(best, t)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=10, help="number of runs")
+    parser.add_argument("--record", metavar="FILE.jsonl")
+    args = parser.parse_args()
+
+    example = os.path.join(root, "examples", "solver.m")
+    results = {
+        "python": run(["-c", "pass"], args.n),
+        "import_parse": run(["-c", "import smop.parse"], args.n),
+        "translate": run(["-m", "smop", "-o", os.devnull, example], args.n),
+    }
+    sys.argv[1:] = []  # smop.options parses sys.argv
+    from smop import lexer, version
+
+    lexer.new()
+    results["lexer_new"] = min(timeit.repeat(lexer.new, number=1000, repeat=5)) / 1000
+
+    for k, v in results.items():
+        print("%-14s %8.2f ms" % (k, v * 1e3))
+    if args.record:
+        results["version"] = version.__version__
+        results["time"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with open(args.record, "a") as fp:
+            fp.write(json.dumps(results) + "\n")
+
+
+if __name__ == "__main__":
+    main()
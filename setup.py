@@ -26,11 +26,13 @@ setup(
         ],
     },
     packages=["smop"],
+    # prebuilt parser tables, see smop/parse.py
+    package_data={"smop": ["parsetab.pickle"]},
     install_requires=[
         "ply",
         "numpy",
         "scipy",
-        "networkx>=2.0.0",
     ],
-    extras_require={"test": ["pytest"]},
+    # networkx is needed only to export the def-use graph
+    extras_require={"test": ["pytest"], "graph": ["networkx>=2.0.0"]},
 )
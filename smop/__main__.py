@@ -2,17 +2,30 @@
 # Copyright 2011-2016 Victor Leikehman
 import sys
 import os
+import io
 import traceback
+import collections
+import multiprocessing
+from fnmatch import fnmatch
 from os.path import basename, splitext
 
 from . import options
 from . import parse
+from . import node
 from . import resolve
 from . import backend
 from . import version
+from . import cache
+from . import serialize
+from . import archive
+from . import callgraph
+from . import infer
+from . import vectorize
+from . import fold
+from . import profiler
 
 
-def print_header(fp):
+def print_header(fp, filename=""):
     if options.no_header:
         return
     # print("# Running Python %s" % sys.version, file=fp)
@@ -25,7 +38,299 @@ def print_header(fp):
         "please install `smop3` to run it.') from None",
         file=fp
     )
-    print("#", options.filename, file=fp)
+    print("#", filename, file=fp)
+
+
+def translate(buf, filename, deps=None, prof=None):
+    """
+    Run the parse-resolve-backend pipeline on buf, the text
+    of the matlab file filename, and return the generated
+    python code.  Return None if there is nothing to emit.
+    If deps is a dict, the functions defined and called by
+    the file are stored there for the --incremental index.
+    If prof is a profile record, the stages are measured
+    into it (see smop.profiler).
+    """
+    buf = buf.replace("\r\n", "\n")
+    # FIXME buf = buf.decode("ascii", errors="ignore")
+    buf = buf if buf[-1:] == "\n" else buf + "\n"
+    profiler.count_tokens(prof, buf, filename)
+    with profiler.stage(prof, "parse"):
+        stmt_list = parse.parse(buf, filename)
+    if prof is not None:
+        prof["nodes"] = sum(1 for u in node.postorder(stmt_list))
+    if not stmt_list:
+        if deps is not None:
+            deps["defines"], deps["calls"] = {}, []
+        return None
+    if not options.no_resolve:
+        with profiler.stage(prof, "resolve"):
+            resolve.resolve(stmt_list)
+            dump_ast(stmt_list, filename)
+            elided = resolve.elide_copies(stmt_list)
+        for func_name, n, total in elided:
+            if options.verbose:
+                print("\t%s: %d of %d copies elided" % (func_name, n, total))
+        with profiler.stage(prof, "infer"):
+            infer.infer(stmt_list)
+        if not options.no_vectorize:
+            with profiler.stage(prof, "vectorize"):
+                n = vectorize.vectorize(stmt_list)
+            if options.verbose:
+                print("\t%d loops vectorized" % n)
+        with profiler.stage(prof, "fold"):
+            n = fold.fold(stmt_list)
+            m = fold.hoist(stmt_list)
+        if options.verbose:
+            print("\t%d expressions folded, %d hoisted" % (n, m))
+    else:
+        dump_ast(stmt_list, filename)
+    if deps is not None:
+        deps["defines"], deps["calls"] = callgraph.summary(stmt_list)
+    if not options.no_backend:
+        with profiler.stage(prof, "backend"):
+            return backend.backend(stmt_list, filename=filename)
+    return ""
+
+
+def dump_ast(stmt_list, filename):
+    """
+    With --ast-dir, save stmt_list there, under the path of
+    filename, as output_path does with -Z, so that files of
+    different directories don't clash.
+    """
+    if not options.ast_dir:
+        return
+    f = splitext(archive.output_name(filename))[0] + ".ast"
+    path = os.path.join(options.ast_dir, *f.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as fp:
+        serialize.dump(stmt_list, fp)
+
+
+def translate_cached(data, filename, deps=None, prof=None):
+    """
+    Same as translate, but data are the raw bytes of the file.
+    With --cache-dir, a cache hit skips the translation, unless
+    deps are requested, or --ast-dir, which need the parse tree.
+    """
+    # decode exactly as open(filename).read() would
+    buf = io.TextIOWrapper(io.BytesIO(data)).read()
+    if not options.cache_dir:
+        return translate(buf, filename, deps, prof)
+    k = cache.key(data, filename)
+    if deps is not None or options.ast_dir:
+        s = None
+    else:
+        s = cache.get(options.cache_dir, k)
+    if s is not None and prof is not None:
+        prof["cached"] = True
+    if s is None:
+        s = translate(buf, filename, deps, prof)
+        if s is not None:
+            cache.put(options.cache_dir, k, s)
+    return s
+
+
+def translate_file(job):
+    """
+    Worker entry point.  Job is a tuple (index, filename, data),
+    where data are the contents of the file, or None to read it
+    from disk.  Returns (index, filename, code, error, deps,
+    prof), where error is the formatted traceback or None, deps
+    is the index entry of the file with --incremental, or None,
+    and prof is the profile record with --profile, or None.
+    Exceptions never escape, so that the parent reports them
+    in order.
+    """
+    i, filename, data = job
+    prof = profiler.record(filename)
+    try:
+        if data is None:
+            with open(filename, "rb") as fp:
+                data = fp.read()
+        deps = None
+        if options.incremental:
+            deps = {"key": cache.key(data, filename)}
+        s = translate_cached(data, filename, deps, prof)
+        return i, filename, s, None, deps, prof
+    except KeyboardInterrupt:
+        raise
+    except:
+        if prof is not None:
+            prof["error"] = True
+        return i, filename, None, traceback.format_exc(), None, prof
+
+
+def init_worker(values):
+    """Copy the option values of the parent into a worker."""
+    for name, value in values.items():
+        setattr(options, name, value)
+
+
+def option_values():
+    return {
+        action.dest: getattr(options, action.dest)
+        for action in options.parser._actions
+        if action.dest != "help"
+    }
+
+
+def select_files(names=None):
+    """
+    Yield a job (index, filename, data) for each file to
+    translate, either from the file list or, with --archive,
+    from the members of the archive.  If names is given, only
+    the files named there are selected.
+    """
+    if options.archive:
+        sources = archive.members(options.archive, options.glob_pattern)
+    else:
+        sources = ((f, None) for f in options.filelist)
+    for i, (filename, data) in enumerate(sources):
+        if names is not None and filename not in names:
+            continue
+        if options.verbose:
+            print(i, filename)
+        if not filename.endswith(".m"):
+            print("\tIgnored: '%s' (unexpected file type)" % filename)
+            continue
+        if options.glob_pattern and not fnmatch(filename, options.glob_pattern):
+            continue
+        if basename(filename) in options.xfiles:
+            if options.verbose:
+                print("\tExcluded: '%s'" % filename)
+            continue
+        yield i, filename, data
+
+
+def output_name(filename):
+    """
+    Relative path, with "/" separators, of the translation of
+    filename: with -Z, that of the member, for members of
+    different directories may have the same name, otherwise
+    just the base name.
+    """
+    if options.archive:
+        return archive.output_name(filename)
+    return splitext(basename(filename))[0] + ".py"
+
+
+def output_path(filename):
+    """
+    Path of the file the translation of filename is written
+    to, or None if the output is not a file of its own.
+    """
+    if not options.output:
+        return os.path.join(*output_name(filename).split("/"))
+    if os.path.isdir(options.output):
+        return os.path.join(options.output, *output_name(filename).split("/"))
+    return None
+
+
+def outdated(jobs, index, dirty):
+    """
+    Drop the jobs whose source did not change since it was
+    last translated, according to index, and whose output is
+    still there.  The names of the remaining files are added
+    to dirty.
+    """
+    for i, filename, data in jobs:
+        entry = index.get(filename)
+        if entry:
+            if data is None:
+                try:
+                    with open(filename, "rb") as fp:
+                        data = fp.read()
+                except (IOError, OSError):
+                    pass  # reported by translate_file
+            if (
+                data is not None
+                and entry["key"] == cache.key(data, filename)
+                and (entry["output"] is None or os.path.exists(entry["output"]))
+            ):
+                if options.verbose:
+                    print("\tUp to date: '%s'" % filename)
+                continue
+        dirty.add(filename)
+        yield i, filename, data
+
+
+def translate_all(jobs):
+    """
+    Yield the results of translate_file in the order of jobs.
+    With --jobs N, N > 1, the files are translated by a pool of
+    worker processes, otherwise in this process.
+    """
+    njobs = options.jobs if options.jobs > 0 else os.cpu_count()
+    if njobs == 1:
+        for job in jobs:
+            yield translate_file(job)
+        return
+    pool = multiprocessing.Pool(
+        njobs, initializer=init_worker, initargs=(option_values(),)
+    )
+    # At most window jobs are in flight, so that the members of
+    # a large archive are not all read into memory at once.
+    # Results are taken in submission order, which keeps the
+    # output and the error reports deterministic.
+    window = 4 * njobs
+    pending = collections.deque()
+    try:
+        for job in jobs:
+            pending.append(pool.apply_async(translate_file, (job,)))
+            if len(pending) >= window:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def write_results(results, fp, out, index=None, changed=None, records=None):
+    """
+    Write the translated files and report the errors.  With
+    --incremental, update index and add to changed the names
+    of the functions whose signatures changed.  With --profile,
+    append the profile records to records.  Returns the number
+    of errors.
+    """
+    nerrors = 0
+    try:
+        for i, filename, s, error, deps, prof in results:
+            if records is not None and prof is not None:
+                records.append(prof)
+            if error:
+                nerrors += 1
+                sys.stdout.write(error)
+                if index is not None:
+                    index.pop(filename, None)
+                if options.strict:
+                    break
+                continue
+            if index is not None:
+                old = index.get(filename, {}).get("defines", {})
+                changed |= callgraph.changed_signatures(old, deps["defines"])
+                deps["output"] = output_path(filename) if s is not None else None
+                index[filename] = deps
+            if s is None:
+                continue
+            if out:
+                buf = io.StringIO()
+                print_header(buf, filename)
+                buf.write(s)
+                out.write(output_name(filename), buf.getvalue())
+            elif not options.output:
+                with open(output_path(filename), "w") as f:
+                    print_header(f, filename)
+                    f.write(s)
+            else:
+                fp.write(s)
+    finally:
+        results.close()
+    return nerrors
 
 
 def main():
@@ -33,57 +338,68 @@ def main():
         import pdb
 
         pdb.set_trace()
-    if not options.filelist:
+    if not options.filelist and not options.archive:
         options.parser.print_help()
         return
+    if options.output and options.output.endswith(("/", os.sep)):
+        os.makedirs(options.output, exist_ok=True)
+    if options.incremental and options.output and not os.path.isdir(options.output):
+        options.parser.error("--incremental needs -o DIRECTORY, or no -o")
+    fp = out = None
     if options.output == "-":
         fp = sys.stdout
+    elif options.output and (
+        archive.is_archive(options.output) or os.path.isdir(options.output)
+    ):
+        out = archive.writer(options.output)
     elif options.output:
         fp = open(options.output, "w")
-    else:
-        fp = None
+    elif options.archive:
+        out = archive.writer(os.curdir)
     if fp:
         print_header(fp)
 
     nerrors = 0
-    for i, options.filename in enumerate(options.filelist):
-        try:
-            if options.verbose:
-                print(i, options.filename)
-            if not options.filename.endswith(".m"):
-                print("\tIgnored: '%s' (unexpected file type)" % options.filename)
-                continue
-            if basename(options.filename) in options.xfiles:
+    index = None
+    records = [] if options.profile else None
+    try:
+        if not options.incremental:
+            results = translate_all(select_files())
+            nerrors = write_results(results, fp, out, records=records)
+        else:
+            index_dir = options.output or "."
+            index = callgraph.load_index(index_dir)
+            changed = set()
+            dirty = set()
+            results = translate_all(outdated(select_files(), index, dirty))
+            nerrors = write_results(results, fp, out, index, changed, records)
+            # The callers of the functions whose signatures changed
+            # are translated again, even if their source did not
+            # change.  Their own signatures stay the same, so one
+            # pass is enough.
+            redo = callgraph.dependents(index, changed) - dirty
+            if redo and not (nerrors and options.strict):
                 if options.verbose:
-                    print("\tExcluded: '%s'" % options.filename)
-                continue
-            buf = open(options.filename).read()
-            buf = buf.replace("\r\n", "\n")
-            # FIXME buf = buf.decode("ascii", errors="ignore")
-            stmt_list = parse.parse(buf if buf[-1] == "\n" else buf + "\n")
-
-            if not stmt_list:
-                continue
-            if not options.no_resolve:
-                G = resolve.resolve(stmt_list)
-            if not options.no_backend:
-                s = backend.backend(stmt_list)
-            if not options.output:
-                f = splitext(basename(options.filename))[0] + ".py"
-                with open(f, "w") as fp:
-                    print_header(fp)
-                    fp.write(s)
-            else:
-                fp.write(s)
-        except KeyboardInterrupt:
-            break
-        except:
-            nerrors += 1
-            traceback.print_exc(file=sys.stdout)
-            if options.strict:
-                break
-        finally:
-            pass
+                    print("\tSignatures changed:", " ".join(sorted(changed)))
+                results = translate_all(select_files(redo))
+                nerrors += write_results(results, fp, out, index, changed, records)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out:
+            out.close()
+        if index is not None:
+            callgraph.save_index(index_dir, index)
+    if options.cache_dir:
+        n = cache.prune(options.cache_dir, options.cache_size * 2 ** 20)
+        if n and options.verbose:
+            print("\tEvicted %d cache entries" % n)
+    if records is not None:
+        profiler.write(records, options.profile)
+        # not into the code, with -o-
+        profiler.summary(
+            records, options.profile_top, sys.stderr if fp is sys.stdout else sys.stdout
+        )
     if nerrors:
         print("Errors:", nerrors)
 
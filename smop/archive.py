@@ -0,0 +1,121 @@
+# SMOP -- Simple Matlab/Octave to Python compiler
+# Copyright 2011-2016 Victor Leikehman
+"""
+Archive input and output.
+
+Members of tar (plain, gzip, bz2 or xz compressed) and zip
+archives are read one by one into memory and handed to the
+parser; nothing is extracted to disk.  The generated files are
+written either into an output archive or into a directory,
+under the member names with ".m" replaced by ".py".
+"""
+
+import io
+import os
+import time
+import tarfile
+import zipfile
+from fnmatch import fnmatch
+from os.path import splitext
+
+tar_suffixes = {
+    ".tar": "w",
+    ".tar.gz": "w:gz",
+    ".tgz": "w:gz",
+    ".tar.bz2": "w:bz2",
+    ".tbz2": "w:bz2",
+    ".tar.xz": "w:xz",
+    ".txz": "w:xz",
+}
+
+
+def is_archive(filename):
+    return filename.endswith(".zip") or any(
+        filename.endswith(s) for s in tar_suffixes
+    )
+
+
+def members(archive, pattern=None):
+    """
+    Yield (name, data) for every ".m" member of archive whose
+    name matches the glob pattern.  Tar archives are read as a
+    stream, so compressed tarballs are decompressed only once.
+    """
+    if zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or not selected(info.filename, pattern):
+                    continue
+                yield info.filename, zf.read(info)
+        return
+    with tarfile.open(archive, "r|*") as tf:
+        for info in tf:
+            if not info.isfile() or not selected(info.name, pattern):
+                continue
+            yield info.name, tf.extractfile(info).read()
+
+
+def selected(name, pattern):
+    return name.endswith(".m") and (not pattern or fnmatch(name, pattern))
+
+
+def output_name(name):
+    """
+    Relative path of the translation of member name.  Absolute
+    paths and ".." components are dropped, so that output never
+    escapes the output directory.
+    """
+    parts = name.replace("\\", "/").split("/")
+    parts = [p for p in parts if p not in ("", ".", "..")]
+    return splitext("/".join(parts))[0] + ".py"
+
+
+class directory_writer(object):
+    def __init__(self, directory):
+        self.directory = directory
+
+    def write(self, name, s):
+        path = os.path.join(self.directory, *output_name(name).split("/"))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as fp:
+            fp.write(s)
+
+    def close(self):
+        pass
+
+
+class tar_writer(object):
+    def __init__(self, filename):
+        mode = [m for s, m in tar_suffixes.items() if filename.endswith(s)][0]
+        self.tf = tarfile.open(filename, mode)
+
+    def write(self, name, s):
+        data = s.encode("utf-8")
+        info = tarfile.TarInfo(output_name(name))
+        info.size = len(data)
+        info.mtime = time.time()
+        info.mode = 0o644
+        self.tf.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        self.tf.close()
+
+
+class zip_writer(object):
+    def __init__(self, filename):
+        self.zf = zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED)
+
+    def write(self, name, s):
+        self.zf.writestr(output_name(name), s)
+
+    def close(self):
+        self.zf.close()
+
+
+def writer(output):
+    """Return a writer for output, an archive or a directory name"""
+    if output.endswith(".zip"):
+        return zip_writer(output)
+    if is_archive(output):
+        return tar_writer(output)
+    return directory_writer(output)
@@ -10,12 +10,14 @@ func decl:  nargout=1 must be declared if function may return
 return value:  return (x,y,z)[:nargout] or return x
 """
 
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
 
 from . import node
 from . import options
+from . import infer
 from .node import extend, exceptions
 
 indent = " " * 4
@@ -38,8 +40,92 @@ optable = {
 }
 
 
-def backend(t, *args, **kwargs):
-    return t._backend(level=1, *args, **kwargs)
+def backend(t, *args, filename="", **kwargs):
+    """
+    Return the python code of t.  filename is printed in the
+    "# file:line" comments.
+    """
+    global emitted, constants, source, arrays
+    saved = emitted, constants, source, arrays
+    emitted = {}
+    constants = {}
+    source = filename
+    arrays = set(array_names(t))
+    try:
+        node.walk(t, post=emit)
+        s = t._backend(level=1, *args, **kwargs)
+        if constants:
+            s = "".join("%s=constant(%s)\n" % (k, v) for v, k in constants.items()) + s
+        return s
+    finally:
+        emitted, constants, source, arrays = saved
+
+
+# Expressions are emitted bottom up, without recursion, which
+# deeply nested ones would overflow.  The text of each is kept
+# in emitted, where the _backend of its parent finds it.
+expressions = (
+    node.expr,
+    node.expr_list,
+    node.concat_list,
+    node.global_list,
+    node.funcall,
+    node.ident,
+    node.number,
+    node.string,
+    node.logical,
+    node.lambda_expr,
+)
+
+emitted = {}
+
+# Matrices of literals are built once, at module level, into
+# read-only arrays, and each use shares the prebuilt array, or
+# is the array itself when resolve.elide_copies says so.  The
+# names are made of the hash of the text, so that the files of
+# a single -o output don't clash.
+constants = {}
+
+# the name of the matlab file, see backend
+source = ""
+
+# Names of the variables used as arrays -- transposed, indexed
+# or with fields.  loop_range yields python ints, which aren't,
+# so for loops over such variables iterate arange instead.
+arrays = set()
+
+
+def array_names(t):
+    for u in node.postorder(t):
+        if u.__class__ is node.transpose or u.__class__ is node.expr and u.op == ".":
+            a = u.args[0]
+        elif u.__class__ in (node.arrayref, node.cellarrayref):
+            a = u.func_expr
+        else:
+            continue
+        if a.__class__ is node.ident:
+            yield a.name
+
+
+def matrix_constant(m):
+    """The name of the module-level constant of matrix m"""
+    s = matrix_text(m)
+    if s not in constants:
+        constants[s] = "_k" + hashlib.sha1(s.encode()).hexdigest()[:8]
+    return constants[s]
+
+
+def emit(u):
+    if isinstance(u, expressions):
+        emitted[id(u)] = u._backend()
+
+
+def memoized(f):
+    def _backend(self, level=0):
+        s = emitted.get(id(self))
+        return f(self, level) if s is None else s
+
+    return _backend
 
 
 # Sometimes user's variable names in the matlab code collide with Python
@@ -79,8 +165,38 @@ def _backend(self, level=0):
         return "(%s+%s)" % (self.args[0]._backend(), self.args[1]._backend())
 
 
+def zero_based(e):
+    if e.__class__ is node.number:
+        return str(e.value - 1)
+    if e.__class__ in (node.ident, node.arrayref):
+        return "%s - 1" % e._backend()
+    return "(%s) - 1" % e._backend()
+
+
+def operand(e):
+    if e.__class__ in (node.ident, node.number, node.arrayref, node.funcall):
+        return e._backend()
+    if e.__class__ is node.expr and e.op == "parens":
+        return e._backend()
+    return "(%s)" % e._backend()
+
+
 @extend(node.arrayref)
 def _backend(self, level=0):
+    # A scalar element of an array of known rank, indexed by
+    # integers known to be positive, is read with ndarray.item,
+    # which takes zero-based C-order indices and returns a python
+    # number.  Zero or negative indices would count from the end,
+    # so other indices go through __getitem__, which checks them.
+    if self.func_expr.__class__ is node.ident and self.func_expr.props != "U":
+        t = infer.typeof(self.func_expr)
+        if infer.is_array(t) and 0 not in t.shape:
+            if len(self.args) == 2 or len(self.args) == 1 and infer.is_vector(t):
+                if all(infer.positive(a) for a in self.args):
+                    return "%s.item(%s)" % (
+                        self.func_expr._backend(),
+                        ", ".join(zero_based(a) for a in self.args),
+                    )
     fmt = "%s[%s]"
     return fmt % (self.func_expr._backend(), self.args._backend())
 
@@ -216,6 +332,19 @@ def _backend(self, level=0):
 
 @extend(node.for_stmt)
 def _backend(self, level=0):
+    if (
+        self.expr.__class__ is node.expr
+        and self.expr.op == ":"
+        and len(self.expr.args) in (2, 3)
+        and self.ident.name not in arrays
+    ):
+        # a colon range is iterated without building the array
+        fmt = "for %s in loop_range(%s):%s"
+        return fmt % (
+            self.ident._backend(),
+            self.expr.args._backend(),
+            self.stmt_list._backend(level + 1),
+        )
     fmt = "for %s in %s.reshape(-1):%s"
     return fmt % (
         self.ident._backend(),
@@ -235,7 +364,7 @@ def %s(%s):
     nargin = %s.nargin
 """ % (
         self.ident._backend(),
-        self.args._backend(),
+        ",".join([t._backend() for t in self.args]),
         self.ident._backend(),
         self.ident._backend(),
     )
@@ -245,6 +374,14 @@ def %s(%s):
 @extend(node.funcall)
 def _backend(self, level=0):
     # import pdb; pdb.set_trace()
+    if (
+        self.func_expr.__class__ is node.ident
+        and self.func_expr.name in ("dot", "multiply")
+        and len(self.args) == 2
+        and infer.is_scalar(infer.typeof(self.args[0]))
+        and infer.is_scalar(infer.typeof(self.args[1]))
+    ):
+        return "(%s * %s)" % (operand(self.args[0]), operand(self.args[1]))
     if not self.nargout or self.nargout == 1:
         return "%s(%s)" % (self.func_expr._backend(), self.args._backend())
     elif not self.args:
@@ -291,7 +428,7 @@ def _backend(self, level=0):
 @extend(node.let)
 def _backend(self, level=0):
     if not options.no_numbers:
-        t = "\n# %s:%s" % (options.filename, self.lineno)
+        t = "\n# %s:%s" % (source, self.lineno)
         # level*indent)
     else:
         t = ""
@@ -308,13 +445,18 @@ def _backend(self, level=0):
                     self.args._backend(),
                 )
         except:
-            s += "%s%s = copy(%s)" % (
+            s += "%s%s = share(%s)" % (
                 self.ret.args[0]._backend(),
                 self.ret.args[1]._backend(),
                 self.args._backend(),
             )
+    elif self.alias and self.args.__class__ is node.matrix:
+        s += "%s=%s" % (self.ret._backend(), matrix_constant(self.args))
     elif self.ret.__class__ is node.ident and self.args.__class__ is node.ident:
-        s += "%s=copy(%s)" % (self.ret._backend(), self.args._backend())
+        if self.alias:
+            s += "%s=%s" % (self.ret._backend(), self.args._backend())
+        else:
+            s += "%s=share(%s)" % (self.ret._backend(), self.args._backend())
     else:
         s += "%s=%s" % (self.ret._backend(), self.args._backend())
     return s + t
@@ -335,11 +477,18 @@ def _backend(self, level=0):
     # 0 0
     if not self.args:
         return "[]"
-    elif any(a.__class__ is node.string for a in self.args):
-        return " + ".join(a._backend() for a in self.args)
-    else:
-        # import pdb; pdb.set_trace()
-        return "concat([%s])" % self.args[0]._backend()
+    if self.is_const():
+        return "share(%s)" % matrix_constant(self)
+    return matrix_text(self)
+
+
+def matrix_text(m):
+    rows = m.args[0]
+    if rows.__class__ is node.expr_list:
+        return "hcat(%s)" % rows._backend()
+    if all(len(row) == 1 for row in rows):
+        return "vcat(%s)" % ",".join(row._backend() for row in rows)
+    return "concat([%s])" % rows._backend()
 
 
 @extend(node.null_stmt)
@@ -416,3 +565,12 @@ def _backend(self, level=0):
 def _backend(self, level=0):
     fmt = "while %s:\n%s\n"
     return fmt % (self.cond_expr._backend(), self.stmt_list._backend(level + 1))
+
+
+for cls in list(vars(node).values()):
+    if (
+        isinstance(cls, type)
+        and issubclass(cls, expressions)
+        and "_backend" in cls.__dict__
+    ):
+        cls._backend = memoized(cls._backend)
@@ -0,0 +1,143 @@
+# SMOP -- Simple Matlab/Octave to Python compiler
+# Copyright 2011-2016 Victor Leikehman
+"""
+On-disk cache of translated files.
+
+Entries are keyed by the sha256 of the matlab source, the
+compiler version, a fingerprint of the files of the
+smop package, and those options which change the
+generated code.  An entry is a plain file containing the
+generated python code, stored under DIR/xx/xxxxxxxx.py
+where xx are the first two hex digits of the key.
+
+The cache is bounded in size.  Hits update the mtime of the
+entry, and prune() deletes the least recently used entries
+until the total size of the cache fits the limit.
+"""
+
+import os
+import hashlib
+import tempfile
+
+from . import options
+from . import version
+
+# options that change the generated code
+flags = (
+    "no_numbers", "no_comments", "testing_mode", "no_resolve", "no_backend",
+    "no_vectorize",
+)
+
+# the fingerprint of the package, computed once
+digest = None
+
+
+def fingerprint():
+    """
+    Return the sha256 of the files of the smop package: the
+    passes, and the tables and recipes they load.  __version__
+    is not bumped whenever a pass changes what it emits.
+    """
+    global digest
+    if digest is None:
+        h = hashlib.sha256()
+        d = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(d)):
+            path = os.path.join(d, name)
+            if not os.path.isfile(path) or name.endswith((".pyc", ".pyo")):
+                continue
+            with open(path, "rb") as fp:
+                h.update(b"\0%s\0" % name.encode())
+                h.update(fp.read())
+        digest = h.hexdigest()
+    return digest
+
+
+def key(data, filename):
+    """
+    Return the cache key for data, the bytes of the matlab
+    file filename.  The name of the file is a part of the key
+    unless --no-numbers is set, because it is printed in the
+    "# file:line" comments.
+    """
+    h = hashlib.sha256()
+    h.update(version.__version__.encode())
+    h.update(b"\0" + fingerprint().encode())
+    for name in flags:
+        h.update(b"\0%s=%r" % (name.encode(), bool(getattr(options, name))))
+    if not options.no_numbers:
+        h.update(b"\0" + filename.encode("utf-8", "surrogateescape"))
+    h.update(b"\0")
+    h.update(data)
+    return h.hexdigest()
+
+
+def path(directory, k):
+    return os.path.join(directory, k[:2], k[2:] + ".py")
+
+
+def get(directory, k):
+    """Return the cached code for k, or None on a miss."""
+    p = path(directory, k)
+    try:
+        with open(p) as fp:
+            s = fp.read()
+    except (IOError, OSError):
+        return None
+    try:
+        os.utime(p, None)
+    except OSError:
+        pass  # concurrently evicted, the hit is still good
+    return s
+
+
+def put(directory, k, s):
+    """
+    Store s under k.  The entry is written to a temporary file
+    which is then renamed, so that concurrent workers never see
+    a partially written entry.
+    """
+    p = path(directory, k)
+    d = os.path.dirname(p)
+    os.makedirs(d, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=d, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as fp:
+            fp.write(s)
+        os.replace(tmp, p)
+    except:
+        os.unlink(tmp)
+        raise
+
+
+def prune(directory, max_size):
+    """
+    Delete the least recently used entries until the total
+    size of the cache is at most max_size bytes.  Returns
+    the number of entries deleted.
+    """
+    entries = []
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(directory):
+        for f in filenames:
+            if not f.endswith(".py"):
+                continue
+            p = os.path.join(dirpath, f)
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+    entries.sort()
+    n = 0
+    for mtime, size, p in entries:
+        if total <= max_size:
+            break
+        try:
+            os.unlink(p)
+        except OSError:
+            continue
+        total -= size
+        n += 1
+    return n
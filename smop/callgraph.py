@@ -1,33 +1,158 @@
-import parse, sys, os
-import networkx as nx
-import node, resolve, options
+# SMOP -- Simple Matlab/Octave to Python compiler
+# Copyright 2011-2016 Victor Leikehman
+"""
+Call graph and the project-level dependency index.
 
+The parser returns a flat stmt_list, where each func_stmt is
+followed by the statements of its body, so the statements
+belong to the function declared last before them.  The
+statements preceding the first func_stmt form a script,
+which is named after the file.
 
-def callgraph(G, stmt_list):
+The index, used by --incremental, maps each translated file
+to the cache key of its source, the signatures of the
+functions it defines, and the names of the functions it
+calls.  A file is translated again if its key changed, or
+if the signature of a function it calls changed.
+"""
+
+import os
+import json
+from os.path import basename, splitext
+
+from . import node
+
+index_name = ".smop-index.json"
+index_version = 1
+
+
+def functions(stmt_list):
+    """
+    Yield (func_stmt, statements) for each function in stmt_list.
+    The statements of a script are yielded with func_stmt None.
+    """
+    func = None
+    body = []
+    for stmt in stmt_list:
+        if isinstance(stmt, node.func_stmt):
+            if func is not None or body:
+                yield func, body
+            func = stmt
+            body = []
+        else:
+            body.append(stmt)
+    if func is not None or body:
+        yield func, body
+
+
+def calls(stmts):
+    """
+    Names of the functions called by stmts.  After resolve, an
+    ident without definitions is a function, not a variable.
+    """
+    names = set()
+    for stmt in stmts:
+        for u in node.postorder(stmt):
+            if u.__class__ is node.funcall and u.func_expr.__class__ is node.ident:
+                if not u.func_expr.defs:
+                    names.add(u.func_expr.name)
+            elif u.__class__ is node.ident and u.defs == []:
+                names.add(u.name)
+    return names
+
+
+def signature(func):
+    """
+    The part of a function declaration the callers depend on:
+    number of arguments, number of return values, and the use
+    of varargin and varargout.
+    """
+    args = [a.name for a in func.args]
+    ret = [r.name for r in func.ret]
+    return [
+        len(args),
+        len(ret),
+        "varargin" in args,
+        "varargout" in ret,
+    ]
+
+
+def summary(stmt_list):
+    """
+    Return (defines, calls) for the index, where defines maps
+    the names of the functions declared in stmt_list to their
+    signatures.  Must run before backend, which modifies the
+    argument lists.
+    """
+    defines = {}
+    called = set()
+    for func, body in functions(stmt_list):
+        if func is not None:
+            defines[func.ident.name] = signature(func)
+        called |= calls(body)
+    return defines, sorted(called - set(defines))
+
+
+def callgraph(G, stmt_list, script_name="__script__"):
     """
     Build callgraph of func_list, ignoring
     built-in functions
     """
-    func_list = []
-    for stmt in stmt_list:
-        try:
-            G.add_node(stmt.head.ident.name)
-            func_list.append(stmt)
-        except:
-            pass
-    for func in func_list:
-        assert isinstance(func, node.function)
-        func_name = func.head.ident.name
-        # resolve.resolve(func)
-        for s in node.postorder(func):
-            if s.__class__ is node.funcall and s.func_expr.__class__ is node.ident:
-                # if s.func_expr.name in G.nodes():
-                G.add_edge(func_name, s.func_expr.name)
+    for func, body in functions(stmt_list):
+        func_name = func.ident.name if func else script_name
+        G.add_node(func_name)
+        for name in calls(body):
+            G.add_edge(func_name, name)
     # nx.write_dot(G,"G.dot")
     # for u in G.nodes():
     #    if G.out_degree(u) == 0:
     #        print u
 
 
+def load_index(directory):
+    """Return the index stored in directory, or an empty one"""
+    try:
+        with open(os.path.join(directory, index_name)) as fp:
+            index = json.load(fp)
+    except (IOError, OSError, ValueError):
+        return {}
+    if index.get("version") != index_version:
+        return {}
+    return index.get("files", {})
+
+
+def save_index(directory, index):
+    filename = os.path.join(directory, index_name)
+    tmp = filename + ".tmp"
+    with open(tmp, "w") as fp:
+        json.dump({"version": index_version, "files": index}, fp, sort_keys=True)
+    os.replace(tmp, filename)
+
+
+def dependents(index, names):
+    """Files in the index which call any of the functions names"""
+    names = set(names)
+    return set(f for f, entry in index.items() if names.intersection(entry["calls"]))
+
+
+def changed_signatures(old, new):
+    """Names of the functions added, removed or changed"""
+    return set(
+        name
+        for name in set(old) | set(new)
+        if old.get(name) != new.get(name)
+    )
+
+
 if __name__ == "__main__":
-    main()
+    import sys
+    import networkx as nx
+    from . import parse, resolve
+
+    G = nx.DiGraph()
+    for filename in sys.argv[1:]:
+        stmt_list = parse.parse(open(filename).read(), filename)
+        resolve.resolve(stmt_list)
+        callgraph(G, stmt_list, splitext(basename(filename))[0])
+    for u in sorted(G.nodes()):
+        print(u, "->", " ".join(sorted(G.successors(u))))
@@ -0,0 +1,354 @@
+# SMOP -- Simple Matlab/Octave to Python compiler
+# Copyright 2011-2016 Victor Leikehman
+"""
+Constant folding, strength reduction and loop-invariant code
+motion.  Runs after resolve, infer and vectorize.
+
+fold rewrites expressions in place:
+
+    2*pi/4          1.5707963267948966
+    n-1+1           n               (if n is an int)
+    x.^2            (x * x)         (if x is a variable)
+    f((a+b))        f(a + b)
+
+hoist moves the subexpressions of loop bodies which don't
+depend on the loop out of the loop, into temporaries:
+
+    for i = 1:n                     _t1 = dot(2, a) + b
+      y(i) = 2*a+b + i;             for i = 1:n
+    end                               y(i) = _t1 + i
+
+An expression is invariant if it is built of literals and of
+variables whose reaching definitions (resolve's def-use
+chains) are all outside the loop, by operators.  Only the
+operators which don't raise on numbers are hoisted: +, -, *
+and .*, comparisons and logical operators, but not division,
+powers nor function calls.  Array references are never
+hoisted, nor is anything under an if or a try, or the right
+operand of && and ||.  Temporaries start with an underscore,
+which matlab names can't.
+
+A loop may run zero times, and then its body must not read
+anything: the variables it uses need not even be defined.
+The invariants of the body of a for loop over start:stop
+are hoisted under "if start <= stop", unless the range is
+known not to be empty, and those of other loops are not
+hoisted at all.  The condition of a while loop is evaluated
+at least once, and its invariants are hoisted as they are.
+"""
+
+import copy
+import math
+
+from . import node
+from . import infer
+
+arithmetic = {
+    "+": lambda a, b: a + b,
+    "-": lambda a, b: a - b,
+    "*": lambda a, b: a * b,
+    ".*": lambda a, b: a * b,
+    "/": lambda a, b: a / b,
+    "./": lambda a, b: a / b,
+    "^": lambda a, b: a ** b,
+    ".^": lambda a, b: a ** b,
+}
+
+# these don't need parens as operands
+atoms = (node.ident, node.number, node.string, node.arrayref, node.funcall)
+
+# hoist doesn't look into these
+unsafe = (node.if_stmt, node.lambda_expr, node.try_catch)
+
+# what hoist may move out of a loop which doesn't run: these
+# don't raise on numbers, as / and ^ and most functions may
+pure = ("dot", "multiply")
+
+operators = (
+    "+", "-", ".*", "parens", "!", "~",
+    "<", "<=", ">", ">=", "==", "~=", "!=", "&", "|",
+)
+
+constants = {"pi": math.pi, "eps": 2.0 ** -52}
+
+
+def number(e):
+    """The value of e, if it is a numeric literal or constant"""
+    if e.__class__ is node.number and isinstance(e.value, (int, float)):
+        return e.value
+    if e.__class__ is node.ident and e.defs == [] and e.name in constants:
+        return constants[e.name]
+    return None
+
+
+def literal(value):
+    """A number node for value, or None if it is not exact"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        if abs(value) > 2 ** 53:
+            return None
+    elif not isinstance(value, float) or math.isinf(value) or math.isnan(value):
+        return None
+    return node.number(value=value)
+
+
+def is_int(e):
+    t = infer.typeof(e)
+    return t is not None and t.dtype == "int"
+
+
+def fold(stmt_list):
+    """Simplify the expressions of stmt_list.  Returns the count."""
+    count = [0]
+
+    def unwrap(u):
+        for k, v in enumerate(u):
+            if v.__class__ is node.expr and v.op == "parens":
+                u[k] = v.args[0]
+                count[0] += 1
+
+    def f(u):
+        # full expressions, and arguments, need no parens
+        if u.__class__ in (node.let, node.if_stmt, node.while_stmt):
+            unwrap(u)
+        elif isinstance(u, node.funcall) and isinstance(u.args, node.expr_list):
+            unwrap(u.args)
+        w = simplify(u)
+        if w is not u:
+            count[0] += 1
+        return w
+
+    node.transform(stmt_list, f)
+    return count[0]
+
+
+def simplify(e):
+    """Return the simplification of e, or e itself"""
+    if e.__class__ is node.expr:
+        args = e.args
+        if e.op == "parens":
+            a = args[0]
+            if (
+                a.__class__ is node.number
+                and isinstance(a.value, (int, float))
+                and a.value >= 0
+            ):
+                return a
+            if a.__class__ in atoms or a.__class__ is node.expr and a.op == "parens":
+                return a
+            return e
+        if len(args) == 1 and e.op == "-":
+            v = number(args[0])
+            if v is not None:
+                return literal(-v) or e
+            return e
+        if len(args) != 2:
+            return e
+        a, b = number(args[0]), number(args[1])
+        if e.op in arithmetic and a is not None and b is not None:
+            try:
+                return literal(arithmetic[e.op](a, b)) or e
+            except (ArithmeticError, ValueError):
+                return e
+        if e.op in (".^", "^") and b == 2 and args[1].__class__ is node.number:
+            x = args[0]
+            if x.__class__ is node.ident and x.defs and (
+                e.op == ".^" or infer.is_scalar(infer.typeof(x))
+            ):
+                return node.expr(
+                    op="parens",
+                    args=node.expr_list([node.expr(op=".*", args=node.expr_list([x, x]))]),
+                )
+        if e.op in ("+", "-") and args[1].__class__ is node.number:
+            return reassociate(e)
+        return e
+    if e.__class__ is node.funcall and e.func_expr.__class__ is node.ident:
+        if e.func_expr.name in ("dot", "multiply") and not e.func_expr.defs:
+            if len(e.args) == 2:
+                a, b = number(e.args[0]), number(e.args[1])
+                if a is not None and b is not None:
+                    return literal(a * b) or e
+    return e
+
+
+def reassociate(e):
+    """(x + c1) - c2 is x + (c1 - c2), when x is an int"""
+    c = e.args[1].value
+    if not isinstance(c, int):
+        return e
+    if e.op == "-":
+        c = -c
+    x = e.args[0]
+    if (
+        x.__class__ is node.expr
+        and x.op in ("+", "-")
+        and len(x.args) == 2
+        and x.args[1].__class__ is node.number
+        and isinstance(x.args[1].value, int)
+    ):
+        c += x.args[1].value if x.op == "+" else -x.args[1].value
+        x = x.args[0]
+    elif c:
+        return e
+    if not is_int(x):
+        return e
+    if c == 0:
+        return x
+    if c > 0:
+        return node.expr(op="+", args=node.expr_list([x, node.number(value=c)]))
+    return node.expr(op="-", args=node.expr_list([x, node.number(value=-c)]))
+
+
+def hoist(stmt_list):
+    """
+    Move loop-invariant subexpressions out of the loops of
+    stmt_list.  Returns the number of temporaries.
+    """
+    names = set()
+    for u in node.postorder(stmt_list):
+        if u.__class__ in (node.global_stmt, node.persistent_stmt):
+            names.update(v.name for v in u.global_list if v.__class__ is node.ident)
+    hoisted = []
+    # postorder visits inner loops first; reversed, the outer
+    # loops are done first, and get the most of the code
+    for s in reversed([u for u in node.postorder(stmt_list) if u.__class__ is node.stmt_list]):
+        k = 0
+        while k < len(s):
+            if s[k].__class__ in (node.for_stmt, node.while_stmt):
+                test = runs(s[k])
+                lets = loop(s[k], names, len(hoisted), test is not None)
+                hoisted.extend(lets)
+                if lets and test is not True and test is not None:
+                    lets = [
+                        node.if_stmt(
+                            cond_expr=test,
+                            then_stmt=node.stmt_list(lets),
+                            else_stmt=None,
+                        )
+                    ]
+                s[k:k] = lets
+                k += len(lets)
+            k += 1
+    return len(hoisted)
+
+
+def runs(stmt):
+    """
+    Whether the body of loop stmt runs: True if the loop is a
+    for loop over a range known not to be empty, the run-time
+    check that it is not, or None if that is not known.
+    """
+    r = stmt.expr if stmt.__class__ is node.for_stmt else None
+    if r.__class__ is not node.expr or r.op != ":" or len(r.args) not in (2, 3):
+        return None
+    start, stop = r.args[0], r.args[1]
+    op = "<="
+    if len(r.args) == 3:
+        step = signed(r.args[2])
+        if step.__class__ is not node.number or not step.value:
+            return None
+        if step.value < 0:
+            op = ">="
+    a, b = signed(start), signed(stop)
+    if a is None or b is None:
+        return None  # a check would evaluate them again
+    if a.__class__ is node.number and b.__class__ is node.number:
+        if a.value <= b.value if op == "<=" else a.value >= b.value:
+            return True
+        return None
+    return node.expr(op=op, args=node.expr_list([copy.copy(a), copy.copy(b)]))
+
+
+def signed(e):
+    """
+    e if it is a variable or a real number, the number if it
+    is minus a number, or None
+    """
+    if e.__class__ is node.expr and e.op == "-" and len(e.args) == 1:
+        a = e.args[0]
+        if a.__class__ is node.number and isinstance(a.value, (int, float)):
+            return node.number(value=-a.value)
+        return None
+    if e.__class__ is node.ident and e.defs:
+        return e
+    if e.__class__ is node.number and isinstance(e.value, (int, float)):
+        return e
+    return None
+
+
+def loop(stmt, names, n, body=True):
+    """
+    Hoist the invariants of loop stmt, and of its body unless
+    body is false.  Returns the new let statements, to be
+    inserted before stmt.
+    """
+    defined = set(id(u) for u in node.postorder(stmt) if u.__class__ is node.ident)
+    cond = node.expr_list([stmt.cond_expr] if stmt.__class__ is node.while_stmt else [])
+    # whether each subexpression is invariant, and whether it
+    # uses any variables, bottom up
+    invariant = {}
+    variables = {}
+    for t in (cond, stmt.stmt_list):
+        for e in node.postorder(t):
+            cls = e.__class__
+            if cls is node.ident:
+                if not e.defs:
+                    inv = e.defs == [] and e.name in constants
+                else:
+                    inv = e.name not in names and all(
+                        id(d) not in defined for d in infer.flat_defs(e)
+                    )
+                variables[id(e)] = bool(e.defs)
+            else:
+                if cls in (node.number, node.string, node.logical):
+                    inv = True
+                elif cls is node.expr and e.op in operators:
+                    inv = all(invariant[id(a)] for a in e.args)
+                elif cls is node.transpose:
+                    inv = invariant[id(e.args[0])]
+                elif cls is node.funcall and e.func_expr.__class__ is node.ident:
+                    inv = (
+                        e.func_expr.defs == []
+                        and e.func_expr.name in pure
+                        and not e.nargout
+                        and all(invariant[id(a)] for a in e.args)
+                    )
+                else:
+                    inv = False
+                variables[id(e)] = any(
+                    variables.get(id(v), False) for v in e if isinstance(v, node.node)
+                )
+            invariant[id(e)] = inv
+    lets = []
+    lineno = [None]
+    skip = set()
+
+    def pre(u):
+        if id(u) in skip or u.__class__ in unsafe:
+            return False
+        if u.__class__ is node.let:
+            lineno[0] = u.lineno
+        elif u.__class__ is node.expr and u.op in ("&&", "||"):
+            skip.update(id(a) for a in u.args[1:])
+        if isinstance(u, tuple):
+            return True
+        for k, v in enumerate(u):
+            if (
+                isinstance(v, node.node)
+                and id(v) not in skip
+                and (v.__class__ not in atoms or v.__class__ is node.funcall)
+                and invariant.get(id(v))
+                and variables.get(id(v))
+            ):
+                t = node.ident(name="_t%d" % (n + len(lets) + 1))
+                t.vtype = infer.typeof(v)
+                w = v.args[0] if v.__class__ is node.expr and v.op == "parens" else v
+                lets.append(node.let(ret=t, args=w, lineno=lineno[0]))
+                u[k] = node.ident(name=t.name, defs=[t], vtype=t.vtype)
+        return True
+
+    node.walk(cond, pre)
+    if body:
+        node.walk(stmt.stmt_list, pre)
+    if cond:
+        stmt.cond_expr = cond[0]
+    return lets
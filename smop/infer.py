@@ -0,0 +1,493 @@
+# SMOP -- Simple Matlab/Octave to Python compiler
+# Copyright 2011-2016 Victor Leikehman
+"""
+Type and shape inference.
+
+A forward dataflow pass over the def-use chains built by
+resolve.  Each definition -- an ident in the lhs of a let,
+an updated array, or a for loop variable -- gets a vtype,
+the join of the values it may be bound to.  References take
+the join of the vtypes of their definitions.
+
+A vtype is (dtype, shape).  The dtype is one of "bool",
+"int", "float", "complex", "char", or None if unknown.  The
+shape is a tuple of dimensions, ints or None if unknown, or
+None if even the rank is unknown.  Scalars have shape (1, 1).
+None, as a vtype, means nothing is known.
+
+Numeric literals with integral values are "int", though in
+matlab they are doubles: such values may be used as indices,
+and are exact in python.
+"""
+
+from collections import namedtuple
+
+from . import node
+
+vtype = namedtuple("vtype", "dtype shape")
+
+# Not computed yet.  The fixpoint iteration starts with all
+# the definitions it is able to compute set to pending, and
+# join ignores them.
+pending = vtype("pending", None)
+
+numeric = ("bool", "int", "float", "complex")
+
+constants = {
+    "pi": "float",
+    "eps": "float",
+    "Inf": "float",
+    "inf": "float",
+    "NaN": "float",
+    "nan": "float",
+    "true": "bool",
+    "false": "bool",
+    "nargin": "int",
+    "nargout": "int",
+}
+
+# element-wise functions of one argument, and the dtype
+# of the result, None to keep that of the argument
+elementwise = {
+    "abs": None,
+    "fix": "float",
+    "floor": "float",
+    "ceil": "float",
+    "round": "float",
+    "sqrt": "float",
+    "exp": "float",
+    "log": "float",
+    "sin": "float",
+    "cos": "float",
+    "tan": "float",
+    "sign": None,
+    "isnan": "bool",
+    "isinf": "bool",
+    "logical_not": "bool",
+}
+
+int_scalars = ("numel", "length", "ndims", "rows", "columns", "nnz")
+
+max_iterations = 20
+
+
+def scalar(dtype):
+    return vtype(dtype, (1, 1))
+
+
+def is_scalar(t):
+    return t is not None and t.shape == (1, 1) and t.dtype in numeric
+
+
+def is_array(t):
+    """
+    Rank is known, and t is not a scalar.  join makes the shape
+    None where a scalar meets an array, so that arrays are
+    known to be ndarrays, and not python numbers.
+    """
+    return (
+        t is not None
+        and t.dtype in numeric
+        and t.shape is not None
+        and len(t.shape) == 2
+        and t.shape != (1, 1)
+    )
+
+
+def is_vector(t):
+    return is_array(t) and 1 in t.shape
+
+
+def promote(a, b):
+    if a == b:
+        return a
+    if a in numeric and b in numeric:
+        return numeric[max(numeric.index(a), numeric.index(b))]
+    return None
+
+
+def join(a, b):
+    """The least vtype describing both a and b"""
+    if a is pending:
+        return b
+    if b is pending:
+        return a
+    if a is None or b is None:
+        return None
+    if a.shape is None or b.shape is None or len(a.shape) != len(b.shape):
+        shape = None
+    elif a.shape != b.shape and (1, 1) in (a.shape, b.shape):
+        # maybe a scalar, and maybe a python number
+        shape = None
+    else:
+        shape = tuple(d if d == e else None for d, e in zip(a.shape, b.shape))
+    dtype = promote(a.dtype, b.dtype)
+    if dtype is None and shape is None:
+        return None
+    return vtype(dtype, shape)
+
+
+def broadcast(a, b, dtype=None):
+    """vtype of an element-wise operation on a and b"""
+    if a is None or b is None:
+        return None
+    dtype = dtype or promote(a.dtype, b.dtype)
+    if a.shape == (1, 1):
+        shape = b.shape
+    elif b.shape == (1, 1) or a.shape == b.shape:
+        shape = a.shape
+    elif a.shape is not None and b.shape is not None and len(a.shape) == len(b.shape):
+        shape = tuple(d if d == e else None for d, e in zip(a.shape, b.shape))
+    else:
+        shape = None
+    if dtype is None and shape is None:
+        return None
+    return vtype(dtype, shape)
+
+
+def flat_defs(u):
+    """
+    The distinct definitions of u, flattened.  Resolve keeps
+    them flat, but trees may nest them (smop.rewrite does).
+    """
+    seen = set()
+    stack = list(u.defs or [])
+    while stack:
+        d = stack.pop()
+        if id(d) in seen:
+            continue
+        seen.add(id(d))
+        if isinstance(d, list):
+            stack.extend(d)
+        else:
+            yield d
+
+
+def dim(e):
+    """The value of e as a dimension, if it is an int literal"""
+    if e.__class__ is node.number and isinstance(e.value, int):
+        return e.value
+    return None
+
+
+# vtypes of the subexpressions, while typeof computes them
+memo = None
+
+# the for loops of the last tree inferred, by the id of their
+# variable: (ident, range), see positive
+loops = {}
+
+
+def typeof(e):
+    """
+    The vtype of expression e, after infer has run.  The
+    subexpressions are typed first, bottom up, so that the
+    recursion below is one level deep.
+    """
+    global memo
+    if memo is not None:
+        t = memo.get(id(e), memo)
+        return typeof_node(e) if t is memo else t
+    memo = {}
+    try:
+        for u in node.postorder(e):
+            memo[id(u)] = typeof_node(u)
+        return memo[id(e)] if isinstance(e, node.node) else typeof_node(e)
+    finally:
+        memo = None
+
+
+def typeof_node(e):
+    cls = e.__class__
+    if cls is node.number:
+        if isinstance(e.value, int):
+            return scalar("int")
+        if isinstance(e.value, complex):
+            return scalar("complex")
+        return scalar("float")
+    if cls is node.string:
+        return vtype("char", (1, len(e.value)))
+    if cls is node.logical:
+        return scalar("bool")
+    if cls is node.ident:
+        if e.defs is None:
+            return e.vtype  # a definition
+        t = pending
+        defs = False
+        for d in flat_defs(e):
+            defs = True
+            t = join(t, d.vtype if d.__class__ is node.ident else None)
+        if defs:
+            return None if t is pending else t
+        if e.name in constants:
+            return scalar(constants[e.name])
+        return None
+    if cls is node.expr:
+        return typeof_expr(e)
+    if cls is node.add or cls is node.sub:
+        return broadcast(typeof(e.args[0]), typeof(e.args[1]))
+    if cls is node.transpose:
+        t = typeof(e.args[0])
+        if t is None or t.shape is None:
+            return t
+        return vtype(t.dtype, tuple(reversed(t.shape)))
+    if cls is node.matrix:
+        return typeof_matrix(e)
+    if cls is node.arrayref:
+        t = typeof(e.func_expr)
+        if t is None or t.dtype not in numeric + ("char",):
+            return None
+        if all(is_scalar(typeof(a)) for a in e.args):
+            return scalar(t.dtype)
+        return vtype(t.dtype, (None, None))
+    if cls is node.funcall and e.func_expr.__class__ is node.ident:
+        return typeof_call(e.func_expr.name, e.args, e.nargout)
+    return None
+
+
+def typeof_expr(e):
+    op = e.op
+    args = e.args
+    if op == "parens":
+        return typeof(args[0])
+    if op in ("&&", "||"):
+        return scalar("bool")
+    if op == ":":
+        if len(args) < 2:
+            return None
+        dtype = "int"
+        for a in args:
+            t = typeof(a)
+            if not is_scalar(t):
+                return None
+            dtype = promote(dtype, t.dtype)
+        return vtype(dtype, (1, None))
+    if len(args) == 1:
+        t = typeof(args[0])
+        if op in ("!", "~"):
+            return broadcast(t, scalar("bool"), "bool")
+        if op in ("-", "+"):
+            return t
+        return None
+    if len(args) != 2:
+        return None
+    a = typeof(args[0])
+    b = typeof(args[1])
+    if op in ("+", "-"):
+        return broadcast(a, b)
+    if op in ("/", "./", "^", ".^"):
+        if op in ("/", "^") and not (is_scalar(a) and is_scalar(b)):
+            return None
+        t = broadcast(a, b)
+        if t is None:
+            return None
+        return vtype(promote(t.dtype, "float"), t.shape)
+    if op in ("<", "<=", ">", ">=", "==", "~=", "!=", "&", "|"):
+        return broadcast(a, b, "bool")
+    return None
+
+
+def typeof_matrix(e):
+    if not e.args:
+        return vtype("float", (0, 0))
+    rows = e.args[0]
+    if rows.__class__ is node.expr_list:
+        rows = [rows]  # a single row
+    dtype = "bool"
+    ncols = None
+    for row in rows:
+        if not isinstance(row, list) or (ncols is not None and len(row) != ncols):
+            return None
+        ncols = len(row)
+        for a in row:
+            t = typeof(a)
+            if not is_scalar(t):
+                return None
+            dtype = promote(dtype, t.dtype)
+    return vtype(dtype, (len(rows), ncols))
+
+
+def typeof_call(name, args, nargout=None):
+    if nargout and nargout > 1:
+        return None
+    if name in ("zeros", "ones", "rand", "randn"):
+        if not args:
+            return scalar("float")
+        if any(a.__class__ is node.string for a in args):
+            return None  # class name, or "like"
+        if len(args) == 1:
+            return vtype("float", (dim(args[0]), dim(args[0])))
+        if len(args) == 2:
+            return vtype("float", (dim(args[0]), dim(args[1])))
+        return None
+    if name == "size":
+        if len(args) == 2:
+            return scalar("int")
+        t = typeof(args[0]) if args else None
+        if t is None or t.shape is None:
+            return vtype("int", (1, None))
+        return vtype("int", (1, len(t.shape)))
+    if name in int_scalars:
+        return scalar("int")
+    if name in ("dot", "multiply"):
+        a = typeof(args[0])
+        b = typeof(args[1])
+        if name == "multiply" or is_scalar(a) or is_scalar(b):
+            return broadcast(a, b)
+        if is_array(a) and is_array(b):
+            return vtype(promote(a.dtype, b.dtype), (a.shape[0], b.shape[1]))
+        return None
+    if name in ("mod", "rem"):
+        return broadcast(typeof(args[0]), typeof(args[1]))
+    if name in elementwise and len(args) == 1:
+        t = typeof(args[0])
+        if t is None:
+            return None
+        dtype = elementwise[name] or t.dtype
+        if name == "abs" and dtype == "complex":
+            dtype = "float"
+        return vtype(dtype, t.shape)
+    return None
+
+
+def element(t):
+    """vtype of the loop variable of a for loop over t"""
+    if t is not None and t.shape is not None and t.shape[:1] == (1,):
+        return scalar(t.dtype) if t.dtype in numeric else None
+    return None
+
+
+def update(t, value, n=1):
+    """
+    vtype of an array t after an update with n subscripts,
+    which may grow it, and add dimensions if n is more than
+    its rank.
+    """
+    if t is pending:
+        t = value
+    if t is None or value is None:
+        return None
+    dtype = promote(t.dtype, value.dtype)
+    if dtype is None:
+        return None
+    if t.shape is None:
+        return vtype(dtype, None)
+    return vtype(dtype, (None,) * (n if n > len(t.shape) else len(t.shape)))
+
+
+def definitions(stmts):
+    """
+    Yield (ident, rule) for each definition in stmts, where
+    rule is a function computing the vtype of the ident.
+    """
+    for stmt in stmts:
+        for u in node.postorder(stmt):
+            if u.__class__ is node.let:
+                ret = u.ret
+                args = u.args
+                if ret.__class__ is node.ident:
+                    yield ret, lambda args=args: typeof(args)
+                elif (
+                    ret.__class__ is node.arrayref
+                    and ret.func_expr.__class__ is node.ident
+                ):
+                    a = ret.func_expr
+                    yield a, lambda a=a, args=args, n=len(ret.args): update(
+                        typeof_refs(a), typeof(args), n
+                    )
+                elif (
+                    isinstance(ret, node.expr_list)
+                    and args.__class__ is node.funcall
+                    and args.func_expr.__class__ is node.ident
+                    and args.func_expr.name == "size"
+                ):
+                    # [m,n] = size(a)
+                    for row in ret:
+                        for v in row:
+                            if v.__class__ is node.ident:
+                                yield v, lambda: scalar("int")
+            elif u.__class__ is node.for_stmt:
+                expr = u.expr
+                yield u.ident, lambda expr=expr: element(typeof(expr))
+
+
+def positive(e):
+    """
+    True if e is known to be an integer not less than 1, such
+    as 2, i and i+1 in the body of for i=1:n.
+    """
+    cls = e.__class__
+    if cls is node.number:
+        return isinstance(e.value, int) and e.value >= 1
+    if cls is node.ident:
+        defs = list(flat_defs(e))
+        for d in defs:
+            r = loops.get(id(d), (None, None))
+            if r[0] is not d or not ascending(r[1]):
+                return False
+        return bool(defs)
+    if cls is node.expr and e.op == "parens":
+        return positive(e.args[0])
+    if cls is node.expr and e.op == "+" and len(e.args) == 2:
+        a, b = e.args
+        return positive(a) and (positive(b) or natural(b)) or natural(a) and positive(b)
+    return False
+
+
+def natural(e):
+    """True if e is an int literal, not less than 0"""
+    return e.__class__ is node.number and isinstance(e.value, int) and e.value >= 0
+
+
+def ascending(r):
+    """True if the values of range r are known to be positive integers"""
+    if r.__class__ is not node.expr or r.op != ":" or len(r.args) not in (2, 3):
+        return False
+    # start:stop:step is expr(":", [start, stop, step])
+    return positive(r.args[0]) and (len(r.args) == 2 or positive(r.args[2]))
+
+
+def typeof_refs(u):
+    """Join of the definitions reaching u, which updates them"""
+    t = pending
+    for d in flat_defs(u):
+        t = join(t, d.vtype if d.__class__ is node.ident else None)
+    return t
+
+
+def infer(stmt_list):
+    """
+    Set the vtype of every ident in stmt_list, which must have
+    been resolved.  Returns the number of fixpoint iterations.
+    """
+    loops.clear()
+    for u in node.postorder(stmt_list):
+        if isinstance(u, node.ident):
+            u.vtype = None
+        elif u.__class__ is node.for_stmt:
+            loops[id(u.ident)] = (u.ident, u.expr)
+    # in the order of the source, so that the first iteration
+    # sees every definition before its uses, except along the
+    # back edges of loops
+    rules = sorted(definitions(stmt_list), key=lambda r: r[0].lexpos or 0)
+    for u, rule in rules:
+        u.vtype = pending
+    for n in range(1, max_iterations + 1):
+        changed = False
+        for u, rule in rules:
+            t = rule()
+            if u.vtype is not pending:
+                t = join(u.vtype, t)
+            if t != u.vtype:
+                u.vtype = t
+                changed = True
+        if not changed:
+            break
+    else:
+        n = max_iterations
+        for u, rule in rules:
+            u.vtype = None
+    for u, rule in rules:
+        if u.vtype is pending:
+            u.vtype = None
+    return n
@@ -1,8 +1,11 @@
 # SMOP -- Simple Matlab/Octave to Python compiler
 # Copyright 2011-2016 Victor Leikehman
 
+import os
 import sys
 import re
+import hashlib
+import warnings
 import ply.lex as lex
 from ply.lex import TOKEN
 from . import options
@@ -91,7 +94,81 @@ reserved = {
 tokens += list(reserved.values())
 
 
+# The compiled lexer.  Every call to new() returns a clone of it,
+# so the master regex is compiled only once per process.
+compiled = None
+
+# The master regexes of fast, one per state, and the rule
+# matched by each of their groups.  Built from compiled.
+masters = None
+
+
 def new():
+    """Return a lexer ready for input(), in the initial state"""
+    global compiled, masters
+    if compiled is None:
+        compiled = build(tables())
+    if options.ply_lexer:
+        lexer = compiled.clone()
+    else:
+        if masters is None:
+            masters = fast.tables(compiled)
+        lexer = fast(masters)
+    lexer.begin("INITIAL")
+    lexer.lineno = 1
+    lexer.brackets = 0  # count open square brackets
+    lexer.parens = 0  # count open parentheses
+    lexer.braces = 0  # count open curly braces
+    lexer.stack = []
+    return lexer
+
+
+def signature():
+    """
+    The prebuilt lextab is valid only for the rules it was
+    built from, so it is stamped with a hash of this file.
+    """
+    try:
+        with open(__file__.replace(".pyc", ".py"), "rb") as fp:
+            return hashlib.sha1(fp.read()).hexdigest()
+    except (IOError, OSError):
+        return None
+
+
+def tables():
+    """Return the lextab module, or None if it is missing or stale"""
+    try:
+        from . import lextab
+    except ImportError:
+        return None
+    sig = signature()
+    if sig is None or getattr(lextab, "_signature", None) != sig:
+        return None
+    return lextab
+
+
+def write_tables():
+    """
+    Regenerate lextab.py, the prebuilt lexer tables shipped with
+    the package.  Run it after changing the rules in this file:
+
+        $ python -c "from smop import lexer; lexer.write_tables()"
+    """
+    filename = os.path.join(os.path.dirname(__file__), "lextab.py")
+    if os.path.exists(filename):
+        os.remove(filename)
+    sys.modules.pop(__package__ + ".lextab", None)
+    build("lextab")
+    with open(filename, "a") as fp:
+        fp.write("_signature = %r\n" % signature())
+
+
+def build(lextab=None):
+    """
+    Build a lexer from the t_* rules below.  Lextab is either
+    a module with prebuilt tables, or the name of the module to
+    write the tables to, or None to build without tables.
+    """
     t_AND = r"\&"
     t_ANDAND = r"\&\&"
     t_ANDEQ = r"\&="
@@ -131,8 +208,6 @@ def new():
 
     states = (("matrix", "inclusive"), ("afterkeyword", "exclusive"))
 
-    states = (("matrix", "inclusive"), ("afterkeyword", "exclusive"))
-
     ws = r"(\s|\.\.\..*\n|\\\n)"
     # ws  = r"(\s|(\#|(%[^!])).*\n|\.\.\..*\n|\\\n)"
     ws1 = ws + "+"
@@ -142,15 +217,6 @@ def new():
     mos = "(%s)|(%s)" % (os, ms)
     id = r"[a-zA-Z_][a-zA-Z_0-9]*"
 
-    def unescape(s):
-        if s[0] == "'":
-            return s[1:-1].replace("''", "'")
-        else:
-            try:
-                return s[1:-1].decode("string_escape")
-            except:
-                return s[1:-1]
-
     @TOKEN(mos)
     def t_afterkeyword_STRING(t):
         t.value = unescape(t.value)
@@ -375,12 +441,205 @@ def new():
     def t_error(t):
         raise_exception(SyntaxError, ('Unexpected "%s" (lexer)' % t.value), t.lexer)
 
-    lexer = lex.lex(reflags=re.MULTILINE)
-    lexer.brackets = 0  # count open square brackets
-    lexer.parens = 0  # count open parentheses
-    lexer.braces = 0  # count open curly braces
-    lexer.stack = []
-    return lexer
+    if lextab is None:
+        return lex.lex(reflags=re.MULTILINE)
+    # optimize=1 skips validation of the rules, reads the tables
+    # from lextab, or writes them if lextab is a missing module
+    return lex.lex(reflags=re.MULTILINE, optimize=1, lextab=lextab)
+
+
+ends = ("end", "endif", "endfunction", "endwhile", "endfor", "endswitch", "end_try_catch")
+blocks = ("if", "function", "while", "for", "switch", "try")
+
+
+def unescape(s):
+    if s[0] == "'":
+        return s[1:-1].replace("''", "'")
+    else:
+        try:
+            return s[1:-1].decode("string_escape")
+        except:
+            return s[1:-1]
+
+
+def number(s):
+    """The value of numeric literal s, as eval would return it"""
+    if s.isdigit():
+        if s[0] != "0" or len(s) == 1:
+            return int(s)
+        return eval(s)  # a syntax error, unless all zeros
+    if s[-1] in "ij":
+        return complex(s[:-1] + "j")
+    if s[:2] == "0x":
+        return int(s, 16)
+    return float(s)
+
+
+class fast(object):
+    """
+    The lexer built by build(), without the PLY driver.  The
+    master regexes are the same, but those PLY tries in turn
+    -- matrix, then INITIAL -- are joined into one, and the
+    rules are inlined into token(), dispatched on the group
+    which matched.  Numbers are converted without eval.  The
+    token stream is the same, token by token; --ply-lexer
+    falls back to PLY.
+    """
+
+    @staticmethod
+    def tables(ply):
+        """The master regex, and the token name by group, of each state"""
+        result = {}
+        for state, chunks in ply.lexstatere.items():
+            names = [None]
+            for r, index in chunks:
+                # index is as long as the last named group needs
+                names += [f and f[1] for f in index[1:]]
+                names += [None] * (r.groups + 1 - len(index))
+            with warnings.catch_warnings():
+                # "[[(" in t_matrix_FOO, as PLY compiles it
+                warnings.simplefilter("ignore", FutureWarning)
+                r = re.compile("|".join(r.pattern for r, index in chunks), ply.lexreflags)
+            assert r.groups + 1 == len(names)
+            result[state] = (r, names)
+        return result
+
+    def __init__(self, masters):
+        self.masters = masters
+        self.lexdata = None
+        self.lexpos = 0
+        self.lexlen = 0
+
+    def begin(self, state):
+        self.lexstate = state
+        self.lexre, self.names = self.masters[state]
+
+    def input(self, s):
+        self.lexdata = s
+        self.lexpos = 0
+        self.lexlen = len(s)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        t = self.token()
+        if t is None:
+            raise StopIteration
+        return t
+
+    next = __next__
+
+    def token(self):
+        lexdata = self.lexdata
+        lexpos = self.lexpos
+        lexlen = self.lexlen
+        while lexpos < lexlen:
+            m = self.lexre.match(lexdata, lexpos)
+            if m is None:
+                self.lexpos = lexpos
+                raise_exception(
+                    SyntaxError, 'Unexpected "%s" (lexer)' % lexdata[lexpos:], self
+                )
+            type = self.names[m.lastindex]
+            end = m.end()
+            if type == "SPACES":
+                lexpos = end
+                continue
+            lineno = self.lineno
+            value = m.group()
+            if type == "IDENT":
+                if value == "parfor":
+                    value = "for"
+                if value[0] == ".":
+                    # fields are never reserved
+                    self.lineno += value.count("\n")
+                    type = "FIELD"
+                elif value == "end" and (
+                    self.parens > 0 or self.brackets > 0 or self.braces > 0
+                ):
+                    type = "END_EXPR"
+                elif value in ends:
+                    keyword = self.stack.pop()
+                    type = "END_FUNCTION" if keyword == "function" else "END_STMT"
+                elif value in reserved:
+                    type = reserved[value]
+                    if value in blocks:
+                        self.stack.append(value)
+                    if lexdata[end] == "'":
+                        self.begin("afterkeyword")
+                elif value == "classdef":
+                    self.lexpos = end
+                    raise_exception(SyntaxError, "Not implemented: %s" % value, self)
+            elif type == "NUMBER":
+                value = number(value)
+            elif type == "NEWLINE":
+                self.lineno += len(value)
+                if self.parens or self.braces:
+                    lexpos = end
+                    continue
+                type = "SEMI"
+                value = ";"
+            elif type == "COMMA":
+                self.lineno += value.count("\n")
+                if not (self.brackets or self.parens or self.braces):
+                    type = "SEMI"
+            elif type == "SEMI":
+                self.lineno += value.count("\n")
+            elif type == "LPAREN":
+                self.parens += 1
+            elif type == "RPAREN":
+                self.parens -= 1
+            elif type == "LBRACKET" or type == "LBRACE":
+                self.lineno += value.count("\n")
+                if type == "LBRACKET":
+                    self.brackets += 1
+                else:
+                    self.braces += 1
+                if self.brackets + self.braces == 1:
+                    self.begin("matrix")
+            elif type == "RBRACKET" or type == "RBRACE":
+                self.lineno += value.count("\n")
+                if type == "RBRACKET":
+                    self.brackets -= 1
+                else:
+                    self.braces -= 1
+                if self.brackets + self.braces == 0:
+                    self.begin("INITIAL")
+            elif type == "STRING":
+                value = unescape(value)
+                if self.lexstate == "afterkeyword":
+                    self.begin("INITIAL")
+            elif type == "FOO":
+                self.lineno += value.count("\n")
+                type = "COMMA"
+            elif type == "COMMENT":
+                self.lineno += value.count("\n")
+                if options.no_comments:
+                    lexpos = end
+                    continue
+            elif type == "comment":
+                if not options.testing_mode or value[-1] != "!":
+                    end = lexdata.find("\n", end)
+                lexpos = end
+                continue
+            elif type == "ELLIPSIS" or type == "ERROR_STMT":
+                self.lineno += 1
+                lexpos = end
+                continue
+            elif type == "BAR":
+                lexpos = end
+                continue
+            # operators and TRANSPOSE are returned as they are
+            tok = lex.LexToken()
+            tok.type = type
+            tok.value = value
+            tok.lineno = lineno
+            tok.lexpos = lexpos
+            self.lexpos = end
+            return tok
+        self.lexpos = lexpos + 1
+        return None
 
 
 def raise_exception(error_type, message, my_lexer):
@@ -389,7 +648,7 @@ def raise_exception(error_type, message, my_lexer):
     raise error_type(
         message,
         (
-            options.filename,
+            getattr(my_lexer, "filename", None) or "",
             my_lexer.lineno,
             1 + my_lexer.lexpos - startpos,
             my_lexer.lexdata[startpos:endpos],
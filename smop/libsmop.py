@@ -4,7 +4,7 @@
 # MIT license
 
 import numpy
-from numpy import sqrt, prod, exp, log, dot, multiply, inf
+from numpy import sqrt, exp, log, dot, multiply, inf
 from numpy.fft import fft2
 from numpy.linalg import inv
 from numpy.linalg import qr as _qr
@@ -15,7 +15,9 @@ except ImportError:
     pass
 import numpy as np
 
-import os, sys, copy, time
+from . import reductions as _reductions
+
+import os, sys, copy, time, weakref
 from sys import stdin, stdout, stderr
 
 try:
@@ -55,6 +57,79 @@ def isvector(a):
         return False
 
 
+def linear_value(value, ix):
+    """
+    Value of a(ix)=value, for an array of integer indices ix.
+    Like matlab, a row value fills a column of indices, and a
+    column value a row of them.
+    """
+    if (
+        isinstance(value, np.ndarray)
+        and isinstance(ix, np.ndarray)
+        and ix.dtype.kind in "iu"
+        and value.size == ix.size > 1
+        and value.shape != ix.shape
+    ):
+        return np.asarray(value).reshape(ix.shape, order="F")
+    return value
+
+
+def index_value(ix, n):
+    """
+    Zero-based equivalent of ix, a one-based index into an
+    axis of length n: an int for integral scalars and end,
+    a slice for ranges with integer bounds.  Returns None if
+    ix is anything else, or if it is out of bounds.
+    """
+    cls = ix.__class__
+    if cls is int or isinstance(ix, np.integer):
+        k = int(ix)
+    elif cls is float or isinstance(ix, np.floating):
+        if not ix.is_integer():
+            return None
+        k = int(ix)
+    elif cls is end:
+        k = n + getattr(ix, "n", 0)
+    elif cls is slice:
+        start = 1 if ix.start is None else ix.start
+        stop = n if ix.stop is None else ix.stop
+        step = 1 if ix.step is None else ix.step
+        if not (start.__class__ is int and stop.__class__ is int and step.__class__ is int):
+            return None
+        if step < 1 or start < 1 or stop > n or stop < start:
+            return None
+        return slice(start - 1, stop, step)
+    elif cls is matlabarray and "range" in ix.__dict__:
+        # made by arange, and not modified since
+        first, step = ix.range
+        last = first + (ix.size - 1) * step
+        if not ix.size:
+            return None
+        if step > 0:
+            if first < 1 or last > n:
+                return None
+            return slice(first - 1, last, step)
+        if last < 1 or first > n:
+            return None
+        return slice(first - 1, last - 2 if last > 1 else None, step)
+    else:
+        return None
+    return k - 1 if 1 <= k <= n else None
+
+
+def appends(old_shape, new_shape):
+    """
+    True if, in column-major order, the data of an array of
+    old_shape are a prefix of the data of one of new_shape.
+    """
+    for i, (s, t) in enumerate(zip(old_shape, new_shape)):
+        if s != t:
+            return old_shape[i + 1 :] + new_shape[i + 1 :] == (1,) * (
+                2 * (len(old_shape) - i - 1)
+            )
+    return True
+
+
 class matlabarray(np.ndarray):
     """
     >>> matlabarray()
@@ -84,6 +159,10 @@ class matlabarray(np.ndarray):
         """must define iter or char won't work"""
         return np.asarray(self).__iter__()
 
+    def __bool__(self):
+        """As a matlab condition: not empty, and no zeros"""
+        return bool(self.size) and bool(np.asarray(self).all())
+
     def compute_indices(self, index):
         if not isinstance(index, tuple):
             index = (index,)
@@ -92,7 +171,9 @@ class matlabarray(np.ndarray):
         indices = []
         for i, ix in enumerate(index):
             if ix.__class__ is end:
-                indices.append(self.shape[i] - 1 + ix.n)
+                # with a single subscript, end is numel
+                n = self.size if len(index) == 1 else self.shape[i]
+                indices.append(n - 1 + ix.n)
             elif ix.__class__ is slice:
                 if self.size == 0 and ix.stop is None:
                     raise IndexError
@@ -107,9 +188,20 @@ class matlabarray(np.ndarray):
                 )
             else:
                 try:
-                    indices.append(int(ix) - 1)
+                    k = int(ix) - 1
                 except:
-                    indices.append(np.asarray(ix).astype("int32") - 1)
+                    ix = np.asarray(ix)
+                    if ix.dtype.kind == "b":
+                        indices.append(np.flatnonzero(ix.reshape(-1, order="F")))
+                    else:
+                        k = ix.astype("int32") - 1
+                        if k.size and k.min() < 0:
+                            raise IndexError("index must be a positive integer")
+                        indices.append(k)
+                else:
+                    if k < 0:
+                        raise IndexError("index must be a positive integer")
+                    indices.append(k)
         if len(indices) == 2 and isvector(indices[0]) and isvector(indices[1]):
             indices[0].shape = (-1, 1)
             indices[1].shape = (-1,)
@@ -121,10 +213,76 @@ class matlabarray(np.ndarray):
         return self.__getitem__(slice(i, j))
 
     def __getitem__(self, index):
-        return matlabarray(self.get(index))
+        t = self.fast_get(index)
+        if t is None:
+            return matlabarray(self.get(index))
+        return t
+
+    def fast_get(self, index):
+        """
+        Fast path of get, for integral scalars, ranges and
+        boolean masks.  Scalar indices return a numpy scalar,
+        ranges return a view, see alias.  Returns None if index
+        is anything else.
+        """
+        if index.__class__ is not tuple:
+            index = (index,)
+        if len(index) == 1:
+            ix = index[0]
+            if isinstance(ix, np.ndarray) and ix.dtype.kind == "b":
+                return self.masked(ix)
+            k = index_value(ix, self.size)
+            if k is None:
+                return None
+            if k.__class__ is int:
+                if self.ndim == 2:
+                    m = self.shape[0]
+                    return np.ndarray.__getitem__(self, (k % m, k // m))
+                return None
+            t = np.ndarray.__getitem__(np.ndarray.reshape(self, -1, order="F"), k)
+            # a(1:n) has the orientation of a vector a,
+            # otherwise that of the row vector 1:n
+            if self.ndim == 2 and self.shape[0] > 1 and self.shape[1] == 1:
+                t = t.reshape(-1, 1)
+            else:
+                t = t.reshape(1, -1)
+        elif len(index) == self.ndim:
+            indices = tuple(map(index_value, index, self.shape))
+            if None in indices:
+                return None
+            for k in indices:
+                if k.__class__ is slice:
+                    break
+            else:
+                return np.ndarray.__getitem__(self, indices)
+            # keep the dimensions indexed by scalars
+            indices = tuple(
+                slice(k, k + 1) if k.__class__ is int else k for k in indices
+            )
+            t = np.ndarray.__getitem__(self, indices)
+        else:
+            return None
+        if t.base is not None:
+            t = self.alias(t)
+        return t
+
+    def masked(self, mask):
+        """a(mask), where mask is a boolean array"""
+        if mask.size > self.size:
+            return None
+        flat = np.asarray(self).reshape(-1, order="F")[: mask.size]
+        t = flat[np.asarray(mask).reshape(-1, order="F")].view(type(self))
+        if not t.size:
+            return None
+        if self.ndim == 2 and self.shape[0] == 1:
+            return t.reshape(1, -1)
+        return t.reshape(-1, 1)
 
     def get(self, index):
         # import pdb; pdb.set_trace()
+        t = self.fast_get(index)
+        if t is not None:
+            return t
         indices = self.compute_indices(index)
         if len(indices) == 1:
             return np.ndarray.__getitem__(self.reshape(-1, order="F"), indices)
@@ -144,62 +302,156 @@ class matlabarray(np.ndarray):
         elif isinstance(ix, slice):
             n = ix.stop
         elif isinstance(ix, (list, np.ndarray)):
-            n = max(ix) + 1
+            n = np.max(ix) + 1
         else:
             assert 0, ix
-        if not isinstance(n, int):
+        if not isinstance(n, (int, np.integer)):
             raise IndexError
-        return n
+        return int(n)
+
+    def alias(self, t=None):
+        """
+        Copy-on-write.  Return t, a view of the data of self, or
+        a new view of all of self, made read-only and registered
+        with the array owning the data.  The first __setitem__ of
+        the view gives it a copy of its own, see detach.  The
+        first __setitem__ of the owner does the same to all its
+        views, see release, before writing in place.
+        """
+        if t is None:
+            t = np.ndarray.view(self, type(self))
+        t.flags.writeable = False
+        owner = t.base
+        if isinstance(owner, matlabarray):
+            if "views" not in owner.__dict__:
+                owner.views = weakref.WeakValueDictionary()
+            owner.views[id(t)] = t
+        return t
+
+    def release(self):
+        """Detach the views of self, which is about to change"""
+        views = self.__dict__.pop("views", None)
+        if views:
+            for t in list(views.values()):
+                if t.base is self:
+                    t.detach()
+
+    def detach(self, t=None):
+        """
+        Replace, in place, the data of self with t, or with a
+        writable copy of its own.  Afterwards self owns its data,
+        and is no longer registered as a view.
+        """
+        # __setstate__ frees the data of an owner without asking
+        # who else is looking at them
+        self.release()
+        if t is None:
+            t = np.ndarray.copy(self, order="F")
+        owner = self.base
+        if isinstance(owner, matlabarray):
+            # the weak reference would keep grow from resizing
+            owner.__dict__.get("views", {}).pop(id(self), None)
+        self.__setstate__(np.ndarray.__reduce__(t)[2])
 
     def __setitem__(self, index, value):
         # import pdb; pdb.set_trace()
+        if "views" in self.__dict__:
+            self.release()
+        if not self.flags.writeable:
+            self.detach()
+        if "range" in self.__dict__:
+            del self.range
         indices = self.compute_indices(index)
+        if len(indices) == 1:
+            value = linear_value(value, indices[0])
         try:
             if len(indices) == 1:
+                if indices[0].__class__ is int and indices[0] >= self.size:
+                    # x(end+1)=v, without asking numpy first
+                    raise IndexError
                 np.asarray(self).reshape(-1, order="F").__setitem__(indices, value)
             else:
                 np.asarray(self).__setitem__(indices, value)
         except (ValueError, IndexError):
             # import pdb; pdb.set_trace()
-            if not self.size:
-                new_shape = [self.sizeof(s) for s in indices]
-                self.resize(new_shape, refcheck=0)
-                np.asarray(self).__setitem__(indices, value)
-            elif len(indices) == 1:
+            if len(indices) == 1:
                 # One-dimensional resize is only implemented for
-                # two cases:
-                #
-                # a. empty matrices having shape [0 0]. These
-                #    matries may be resized to any shape.  A[B]=C
-                #    where A=[], and B is specific -- A[1:10]=C
-                #    rather than A[:]=C or A[1:end]=C
+                # empty matrices, scalars and vectors.  A[B]=C
+                # where A=[], and B is specific -- A[1:10]=C
+                # rather than A[:]=C or A[1:end]=C
                 if self.size and not isvector_or_scalar(self):
                     raise IndexError(
                         "One-dimensional resize "
                         "works only on vectors, and "
                         "row and column matrices"
                     )
-                # One dimensional resize of scalars creates row matrices
+                # One dimensional resize of empty matrices and
+                # scalars creates row matrices
                 # ai = 3
                 # a(4) = 1
                 # 3 0 0 1
                 n = self.sizeof(indices[0])  # zero-based
-                if max(self.shape) == 1:
-                    new_shape = list(self.shape)
-                    new_shape[-1] = n
+                if self.size <= 1:
+                    new_shape = [1] * (self.ndim - 1) + [n]
                 else:
                     new_shape = [(1 if s == 1 else n) for s in self.shape]
-                self.resize(new_shape, refcheck=0)
+                self.grow(new_shape)
                 np.asarray(self).reshape(-1, order="F").__setitem__(indices, value)
             else:
-                new_shape = list(self.shape)
-                if self.flags["C_CONTIGUOUS"]:
-                    new_shape[0] = self.sizeof(indices[0])
-                elif self.flags["F_CONTIGUOUS"]:
-                    new_shape[-1] = self.sizeof(indices[-1])
-                self.resize(new_shape, refcheck=0)
+                if len(indices) != self.ndim:
+                    raise
+                new_shape = [
+                    s if s >= self.sizeof(ix) else self.sizeof(ix)
+                    for s, ix in zip(self.shape, indices)
+                ]
+                self.grow(new_shape)
                 np.asarray(self).__setitem__(indices, value)
 
+    def grow(self, new_shape):
+        """
+        Resize self in place to new_shape, which is not smaller
+        than self.shape in any dimension, keeping every element
+        at its subscripts, and zero-filling the new elements.
+
+        In column-major order, growing the last non-singleton
+        dimension only appends to the data.  That is done with
+        ndarray.resize, which asks realloc for exactly the new
+        size.  The growth is not amortized: there is no spare
+        capacity, and a loop appending one element at a time --
+        such as x(end+1)=v -- is linear only as long as realloc
+        extends the block in place, see bench/grow.py.  Other
+        growth has to move the elements, and copies.
+        """
+        new_shape = tuple(new_shape)
+        old_shape = self.shape
+        if new_shape == old_shape:
+            return
+        if (
+            self.size
+            and not appends(old_shape, new_shape)
+            or not (self.flags["F_CONTIGUOUS"] and self.flags["OWNDATA"])
+            or weakref.getweakrefcount(self)
+        ):
+            # resize works only on arrays which own their data,
+            # and which no other object refers to
+            t = np.zeros(new_shape, dtype=self.dtype, order="F")
+            t[tuple(slice(0, s) for s in old_shape)] = self
+            self.detach(t)
+            return
+        n = 1
+        for s in new_shape:
+            n *= s
+        self.resize(n, refcheck=0)
+        self.shape = new_shape
+        if n not in new_shape:
+            # a matrix; resize leaves it C-contiguous
+            strides = []
+            stride = self.itemsize
+            for s in new_shape:
+                strides.append(stride)
+                stride *= s
+            self.strides = strides
+
     def __repr__(self):
         return self.__class__.__name__ + repr(np.asarray(self))[5:]
 
@@ -214,6 +466,8 @@ class matlabarray(np.ndarray):
 
 
 class end(object):
+    n = 0
+
     def __add__(self, n):
         self.n = n
         return self
@@ -285,21 +539,21 @@ class cellstr(matlabarray):
         """
         Given a two-dimensional char object,
         create a cell array where each cell contains
-        a line.
+        a line, without its trailing blanks.
         """
-        obj = (
-            np.array(
-                ["".join(s) for s in a], dtype=object, copy=False, order="C", ndmin=2
-            )
-            .view(cls)
-            .copy(order="F")
-        )
+        if isinstance(a, np.ndarray) and a.dtype == object:
+            lines = np.asarray(a).reshape(-1, order="F").tolist()
+        else:
+            lines = [s.rstrip() for s in char_rows(char(a))]
+        obj = np.empty((1, len(lines)), dtype=object)
+        obj[0, :] = lines
+        obj = obj.view(cls)
         if obj.size == 0:
             obj.shape = (0, 0)
         return obj
 
     def __str__(self):
-        return "\n".join("".join(s) for s in self.reshape(-1))
+        return "\n".join(np.asarray(self).reshape(-1).tolist())
 
     def __getitem__(self, index):
         return self.get(index)
@@ -325,16 +579,26 @@ class char(matlabarray):
     >>> print s
     hello
     world
+
+    The data are one byte per character, in latin-1, so that
+    codes() sees the same memory as a matrix of uint8, and a
+    string is converted by a single copy of its encoding.
+    char of a list or a cell array of strings pads them with
+    blanks to a matrix, one string per row.
     """
 
     def __new__(cls, a=""):
-        if not isinstance(a, str):
-            a = "".join([chr(c) for c in a])
-        obj = (
-            np.array(list(a), dtype="|S1", copy=False, order="F", ndmin=2)
-            .view(cls)
-            .copy(order="F")
-        )
+        if isinstance(a, str):
+            t = np.frombuffer(a.encode("latin-1"), dtype="|S1").reshape(1, -1)
+        elif isinstance(a, char):
+            t = np.asarray(a)
+        else:
+            t = np.asarray(a)
+            if t.dtype == object or t.dtype.kind == "U":
+                t = char_matrix(t.reshape(-1, order="F").tolist())
+            else:
+                t = t.astype(np.uint8).view("|S1")
+        obj = np.array(t, order="F", ndmin=2).view(cls)
         if obj.size == 0:
             obj.shape = (0, 0)
         return obj
@@ -343,13 +607,72 @@ class char(matlabarray):
         return self.get(index)
 
     def __str__(self):
-        if self.ndim == 0:
-            return ""
-        if self.ndim == 1:
-            return "".join(s for s in self)
-        if self.ndim == 2:
-            return "\n".join("".join(s) for s in self)
-        raise NotImplementedError
+        return "\n".join(char_rows(self))
+
+
+def codes(a):
+    """
+    The character codes of a, a char matrix or a string, as a
+    uint8 array.  For a char this is a view of its data, so
+    that the string functions below work on whole matrices.
+    """
+    if isinstance(a, str):
+        return np.frombuffer(a.encode("latin-1"), dtype=np.uint8).reshape(1, -1)
+    if isinstance(a, np.ndarray) and a.dtype.kind == "S":
+        return np.asarray(a).view(np.uint8)
+    return np.asarray(a, dtype=np.uint8)
+
+
+def char_rows(a):
+    """The rows of a, a char matrix, as python strings"""
+    t = codes(a)
+    if t.ndim != 2:
+        t = t.reshape(1, -1, order="F")
+    # one buffer in row order, which a single row already is
+    s = np.ascontiguousarray(t).tobytes().decode("latin-1")
+    n = t.shape[1]
+    return [s[i : i + n] for i in range(0, len(s), n)] if n else [""] * t.shape[0]
+
+
+def char_matrix(lines):
+    """A C-order array of |S1, the strings lines padded with blanks"""
+    b = [str(s).encode("latin-1") for s in lines]
+    n = np.max([len(t) for t in b]) if b else 0
+    if not n:
+        return np.zeros((len(b), 0), dtype="|S1")
+    t = np.array(b, dtype="|S%d" % n).view(np.uint8).reshape(len(b), n)
+    t[t == 0] = ord(" ")
+    return t.view("|S1")
+
+
+def is_text(a):
+    return isinstance(a, (str, char))
+
+
+def is_cellstr(a):
+    return isinstance(a, np.ndarray) and a.dtype == object
+
+
+def to_str(a):
+    """a, a string or a char matrix, as a python string"""
+    if a.__class__ is str:
+        return a
+    return "".join(char_rows(a))
+
+
+def map_cells(f, a):
+    """
+    The cell array of f applied to each string of a, which f
+    does all at once: the strings are joined into one, with
+    NULs in between, which f must keep.
+    """
+    flat = np.asarray(a).reshape(-1, order="F").tolist()
+    parts = f("\0".join(flat)).split("\0")
+    if len(parts) != len(flat):
+        parts = [f(t) for t in flat]
+    obj = np.empty(np.shape(a), dtype=object, order="F")
+    obj.reshape(-1, order="F")[:] = parts
+    return obj.view(type(a) if isinstance(a, matlabarray) else cellarray)
 
 
 class struct(object):
@@ -365,12 +688,94 @@ def abs(a):
     return numpy.abs(a)
 
 
-def all(a):
-    return numpy.all(a)
+def reduced(r):
+    """
+    The matlabarray of r, the result of a smop.reductions
+    function, or a numpy scalar if it has one element.
+    """
+    if r.__class__ is tuple:
+        return tuple([reduced(t) for t in r])
+    if r.size == 1:
+        return r.reshape(-1)[0]
+    if r.size == 0:
+        return matlabarray(r)
+    return np.asfortranarray(r).view(matlabarray)
+
+
+def all(a, *args):
+    return reduced(_reductions.reduce("all", a, args))
+
+
+def any(a, *args):
+    return reduced(_reductions.reduce("any", a, args))
+
+
+def cumprod(a, *args):
+    return reduced(_reductions.accumulate("cumprod", a, args))
+
 
+def cumsum(a, *args):
+    return reduced(_reductions.accumulate("cumsum", a, args))
 
-def any(a):
-    return numpy.any(a)
+
+def colon_value(a):
+    """Python number for an operand of the colon operator"""
+    if isinstance(a, (np.ndarray, np.generic)):
+        if a.size == 0:
+            return None
+        # matlab uses the first element of an array operand
+        return a.flat[0].item()
+    return a
+
+
+def integral(a):
+    return isinstance(a, int) or isinstance(a, float) and a.is_integer()
+
+
+def colon(start, stop, step=1):
+    """
+    Return (start, step, n, last) describing start:step:stop,
+    as python numbers.  The end point is included if it is
+    within roundoff of the last step, and then it is the
+    last value.
+    """
+    start, stop, step = colon_value(start), colon_value(stop), colon_value(step)
+    if start is None or stop is None or step is None:
+        return 0, 1, 0, None
+    if integral(start) and integral(stop) and integral(step):
+        start, stop, step = int(start), int(stop), int(step)
+        n = (stop - start) // step + 1 if step else 0
+        return start, step, n if n > 0 else 0, None
+    if not step or step != step or start != start or stop != stop:
+        return start, step, 0, None  # zero, or NaN
+    q = (stop - start) / step
+    if q < 0:
+        return start, step, 0, None
+    if q == inf:
+        raise ValueError("%s:%s:%s has too many elements" % (start, step, stop))
+    tol = 2 * eps * (abs(start) if abs(start) > abs(stop) else abs(stop))
+    n = int(np.floor(q + tol / abs(step))) + 1
+    last = start + (n - 1) * step
+    return start, step, n, stop if abs(last - stop) <= tol else last
+
+
+def loop_range(start, stop, step=1):
+    """
+    Iterate over start:step:stop as matlab for loops do, but
+    without building the array.  If start and step are
+    integral, the values are python ints.
+    >>> list(loop_range(1, 3))
+    [1, 2, 3]
+    >>> list(loop_range(0, 0.3, 0.1))
+    [0.0, 0.1, 0.2, 0.3]
+    """
+    start, step, n, last = colon(start, stop, step)
+    if not n:
+        return range(0)
+    if integral(start) and integral(step):
+        start, step = int(start), int(step)
+        return range(start, start + n * step, step)
+    return (start + k * step if k < n - 1 else last for k in range(n))
 
 
 def arange(start, stop, step=1, **kwargs):
@@ -379,19 +784,118 @@ def arange(start, stop, step=1, **kwargs):
     >>> size(a)
     matlabarray([[ 1, 10]])
     """
-    expand_value = 1 if step > 0 else -1
-    return matlabarray(
-        np.arange(start, stop + expand_value, step, **kwargs).reshape(1, -1), **kwargs
-    )
+    start, step, n, last = colon(start, stop, step)
+    if integral(start) and integral(step):
+        start, step = int(start), int(step)
+    a = np.arange(n, **kwargs) * step + start
+    if last is not None and n:
+        a[-1] = last
+    obj = matlabarray(a.reshape(1, -1), **kwargs)
+    first = index_value(start, sys.maxsize)
+    n = index_value(step if step > 0 else -step, sys.maxsize)
+    if first is not None and n is not None:
+        # lets matlabarray.fast_get index with a slice
+        obj.range = (first + 1, int(step))
+    return obj
+
+
+scalars = (int, float, complex, np.number, np.bool_)
 
 
-def concat(args):
+def concat(rows):
     """
-    >>> concat([1,2,3,4,5] , [1,2,3,4,5]])
-    [1, 2, 3, 4, 5, 1, 2, 3, 4, 5]
+    [a b; c d], given as a list of rows, each a list of blocks.
+    The shape of the result is computed first, then it is
+    allocated once, in Fortran order, and each block is copied
+    into it once.  Empty blocks are ignored, as in matlab.  A
+    flat list is a single row, which is what older generated
+    code passes.
+    >>> concat([[1, 2], [3, 4]]).shape
+    (2, 2)
+    >>> concat([1, 2, 3]).shape
+    (1, 3)
     """
-    t = [matlabarray(a) for a in args]
-    return np.concatenate(t)
+    if not rows or rows[0].__class__ is not list:
+        rows = [rows]
+    n = len(rows[0])
+    for row in rows:
+        if len(row) != n or not n or [a for a in row if not isinstance(a, scalars)]:
+            break
+    else:
+        # numbers only, as in [1,261,522,784]
+        return np.array(rows, order="F").view(matlabarray)
+    for row in rows:
+        for a in row:
+            if a.__class__ is str:
+                return concat_text(rows)
+    blocks = []
+    height = 0
+    width = None
+    cls = matlabarray
+    for row in rows:
+        row = [np.asanyarray(a) for a in row]
+        row = [a if a.ndim >= 2 else a.reshape(1, -1) for a in row if a.size]
+        if not row:
+            continue
+        h = row[0].shape[0]
+        w = 0
+        for a in row:
+            if a.shape[0] != h or a.shape[2:] != row[0].shape[2:]:
+                raise ValueError("horizontal dimensions mismatch")
+            if isinstance(a, cellarray):
+                cls = cellarray
+            w += a.shape[1]
+        if width is not None and (w != width or row[0].shape[2:] != rest):
+            raise ValueError("vertical dimensions mismatch")
+        width, rest = w, row[0].shape[2:]
+        blocks.append((height, row))
+        height += h
+    if not blocks:
+        return matlabarray()
+    if cls is cellarray:
+        dtype = object
+    else:
+        dtype = np.result_type(*[a for i, row in blocks for a in row])
+    obj = np.empty((height, width) + rest, dtype=dtype, order="F")
+    for i, row in blocks:
+        j = 0
+        for a in row:
+            obj[i : i + a.shape[0], j : j + a.shape[1]] = a
+            j += a.shape[1]
+    return obj.view(cls)
+
+
+def concat_text(rows):
+    """
+    concat of rows some of whose blocks are strings, which
+    makes them strings: a python string if there is one row,
+    and a char matrix otherwise.
+    """
+    lines = []
+    for row in rows:
+        s = ""
+        for a in row:
+            if is_text(a):
+                s += to_str(a)
+            else:
+                s += to_str(char(np.asarray(a).reshape(1, -1, order="F")))
+        lines.append(s)
+    if len(lines) == 1:
+        return lines[0]
+    lines = [s for s in lines if s]
+    if len(set(map(len, lines))) > 1:
+        raise ValueError("vertical dimensions mismatch")
+    return char(lines)
+
+
+def hcat(*args):
+    """[a b c]"""
+    return concat([list(args)])
+
+
+def vcat(*args):
+    """[a; b; c]"""
+    return concat([[a] for a in args])
 
 
 def ceil(a):
@@ -412,6 +916,29 @@ def copy(a):
     return matlabarray(np.asanyarray(a).copy(order="F"))
 
 
+def share(a):
+    """
+    Same as copy, but an array is copied only when either a or
+    the result is updated, see matlabarray.alias
+    """
+    if isinstance(a, matlabarray):
+        return a.alias()
+    if isinstance(a, np.ndarray):
+        return copy(a)
+    return a
+
+
+def constant(a):
+    """
+    Make a, a module-level constant built by the generated
+    code, read-only, and return it.  It is used through share,
+    or as it is where it is never updated.
+    """
+    if isinstance(a, np.ndarray):
+        a.flags.writeable = False
+    return a
+
+
 def deal(a, **kwargs):
     # import pdb; pdb.set_trace()
     return tuple([ai for ai in a.flat])
@@ -454,33 +981,69 @@ def false(*args):
     return np.zeros(args, dtype=bool, order="F")
 
 
-def find(a, n=None, d=None, nargout=1):
-    if d:
-        raise NotImplementedError
-
-    # there is no promise that nonzero or flatnonzero
-    # use or will use indexing of the argument without
-    # converting it to array first.  So we use asarray
-    # instead of asanyarray
+def find(a, n=None, d="first", nargout=1):
+    """
+    k=find(a), k=find(a,n), k=find(a,n,'first'|'last'), and
+    [i,j]=find(...) and [i,j,v]=find(...).  The indices are
+    one-based, in column-major order, in a row if a is a row,
+    else in a column.  Given n, the array is scanned in chunks,
+    from the end for 'last', until n nonzeros are found.
+    >>> find(matlabarray([[0, 3, 0, 4]]), 1)
+    matlabarray([[2]])
+    """
+    if d.__class__ is not str or d.lower() not in ("first", "last"):
+        raise ValueError("find: direction must be 'first' or 'last'")
+    x = np.asarray(a)
+    if x.ndim < 2:
+        x = x.reshape(1, -1)
+    flat = x.reshape(-1, order="F")
+    if n is None:
+        k = np.flatnonzero(flat)
+    else:
+        if isinstance(n, np.ndarray):
+            n = n.item()
+        if n != int(n) or n < 0:
+            raise ValueError("find: n must be a non-negative integer")
+        k = find_first(flat, int(n), d.lower() == "last")
+    shape = (1, -1) if x.ndim == 2 and x.shape[0] == 1 else (-1, 1)
     if nargout == 1:
-        i = np.flatnonzero(np.asarray(a)).reshape(1, -1) + 1
-        if n is not None:
-            i = i.take(n)
-        return matlabarray(i)
+        return matlabarray((k + 1).reshape(shape))
+    m = x.shape[0]
+    i = matlabarray((k % m + 1).reshape(shape))
+    j = matlabarray((k // m + 1).reshape(shape))
     if nargout == 2:
-        i, j = np.nonzero(np.asarray(a))
-        if n is not None:
-            i = i.take(n)
-            j = j.take(n)
-        return (
-            matlabarray((i + 1).reshape(-1, 1)),
-            matlabarray((j + 1).reshape(-1, 1)),
-        )
-    raise NotImplementedError
+        return i, j
+    return i, j, matlabarray(flat[k].reshape(shape))
+
+
+def find_first(flat, n, last=False):
+    """
+    Zero-based indices of the first n nonzeros of flat, a one
+    dimensional array, or of the last n.  The chunks scanned
+    double in size, so that a hit near the start costs little,
+    and no hit costs about one scan of the whole array.
+    """
+    found = []
+    count = 0
+    k = 0
+    size = 1024
+    while count < n and k < flat.size:
+        if last:
+            start = flat.size - k - size if flat.size - k > size else 0
+            t = np.flatnonzero(flat[start : flat.size - k])[count - n :] + start
+        else:
+            t = np.flatnonzero(flat[k : k + size])[: n - count] + k
+        found.append(t)
+        count += t.size
+        k += size
+        size *= 2
+    if last:
+        found.reverse()
+    return np.concatenate(found) if found else np.zeros(0, dtype=int)
 
 
 def floor(a):
-    return int(numpy.floor(a))
+    return numpy.floor(a)
 
 
 def fopen(*args):
@@ -522,7 +1085,7 @@ def fullfile(*args):
 #
 def iscellstr(a):
     # TODO return isinstance(a,cellarray) and all(ischar(t) for t in a.flat)
-    return isinstance(a, cellarray) and all(isinstance(t, str) for t in a.flat)
+    return isinstance(a, cellarray) and not [t for t in a.flat if not isinstance(t, str)]
 
 
 def ischar(a):
@@ -552,6 +1115,14 @@ def ismatrix(a):
     return True
 
 
+def iscolumn(a):
+    return np.ndim(a) == 2 and np.shape(a)[1] == 1
+
+
+def isrow(a):
+    return np.ndim(a) == 2 and np.shape(a)[0] == 1
+
+
 def isnumeric(a):
     return np.asarray(a).dtype in (int, float)
 
@@ -568,7 +1139,7 @@ def isscalar(a):
 
 def length(a):
     try:
-        return max(np.asarray(a).shape)
+        return np.max(np.asarray(a).shape)
     except ValueError:
         return 1
 
@@ -582,16 +1153,20 @@ except:
     pass
 
 
-def max(a, d=0, nargout=0):
-    if d or nargout:
-        raise NotImplementedError
-    return np.amax(a)
+def max(a, *args, **kwargs):
+    """max(a), max(a,b), max(a,[],dim) and [m,i]=max(...)"""
+    nargout = kwargs.get("nargout", 1)
+    return reduced(_reductions.extremum(a, args, nargout, largest=True))
+
 
+def mean(a, *args):
+    return reduced(_reductions.reduce("mean", a, args))
 
-def min(a, d=0, nargout=0):
-    if d or nargout:
-        raise NotImplementedError
-    return np.amin(a)
+
+def min(a, *args, **kwargs):
+    """min(a), min(a,b), min(a,[],dim) and [m,i]=min(...)"""
+    nargout = kwargs.get("nargout", 1)
+    return reduced(_reductions.extremum(a, args, nargout, largest=False))
 
 
 def mod(a, b):
@@ -628,6 +1203,10 @@ def ones(*args, **kwargs):
 #    return _primes.primes(*args)
 
 
+def prod(a, *args):
+    return reduced(_reductions.reduce("prod", a, args))
+
+
 def qr(a):
     return matlabarray(_qr(np.asarray(a)))
 
@@ -712,7 +1291,7 @@ def size(a, b=0, nargout=1):
     matlabarray([[4, 4]])
     """
     s = np.asarray(a).shape
-    if s is ():
+    if s == ():
         return 1 if b else (1,) * nargout
     # a is not a scalar
     try:
@@ -739,7 +1318,30 @@ sort = sorted
 
 
 def strcmp(a, b):
-    return str(a) == str(b)
+    """
+    True if the strings or char matrices a and b are the same.
+    If either is a cell array, the cells are compared one by
+    one, to a string or to the cells of the other.
+    """
+    if is_cellstr(a) or is_cellstr(b):
+        if is_cellstr(a) and is_cellstr(b):
+            if np.shape(a) != np.shape(b):
+                raise ValueError("strcmp: cell arrays of different sizes")
+            t = np.asarray(a) == np.asarray(b)
+        else:
+            c, s = (a, b) if is_cellstr(a) else (b, a)
+            if not is_text(s):
+                return matlabarray(np.zeros(np.shape(c), dtype=bool))
+            t = np.asarray(c) == to_str(s)
+        return matlabarray(t.astype(bool))
+    if not is_text(a) or not is_text(b):
+        return False
+    if a.__class__ is str and b.__class__ is str:
+        return a == b
+    x, y = codes(a), codes(b)
+    if not x.size and not y.size:
+        return True
+    return x.shape == y.shape and np.array_equal(x, y)
 
 
 def strread(s, format="", nargout=1):
@@ -750,18 +1352,36 @@ def strread(s, format="", nargout=1):
 
 
 def strrep(a, b, c):
-    return str(a).replace(str(b), str(c))
+    """Replace b with c in a string, or in each row or cell of a"""
+    b, c = to_str(b), to_str(c)
+    if is_cellstr(a):
+        return map_cells(lambda s: s.replace(b, c), a)
+    if a.__class__ is str:
+        return a.replace(b, c)
+    rows = char_rows(a)
+    if len(rows) == 1:
+        return char(rows[0].replace(b, c))
+    return char("\0".join(rows).replace(b, c).split("\0"))
 
 
-def sum(a, dim=None):
-    if dim is None:
-        return np.asanyarray(a).sum()
-    else:
-        return np.asanyarray(a).sum(dim - 1)
+def sum(a, *args):
+    return reduced(_reductions.reduce("sum", a, args))
+
+
+def upper(a):
+    """
+    a in upper case.  The letters of char matrices are ascii,
+    and converted all at once on their codes.
+    """
+    if a.__class__ is str:
+        return a.upper()
+    if is_cellstr(a):
+        return map_cells(str.upper, a)
+    t = codes(a)
+    return char(t - (t >= ord("a")) * (t <= ord("z")) * np.uint8(32))
 
 
-def toupper(a):
-    return char(str(a.data).upper())
+toupper = upper
 
 
 true = True
@@ -8,14 +8,6 @@ import copy, sys, inspect
 from .recipes import recordtype
 from . import options
 
-# def preorder(u):
-#     if isinstance(u,traversable):
-#         yield u
-#         for n in u:
-#             for t in preorder(n):
-#                 yield t
-
-
 def decode(self):
     r = ""
     s = self.name
@@ -33,12 +25,79 @@ def encode(s):
     return "".join(c + "_" if c.isupper() or c == "_" else c.upper() for c in s)
 
 
+# The traversals below keep an explicit stack instead of
+# recursing, so that the depth of the tree -- long a+b+c+...
+# chains, big matrices -- is not limited by the recursion
+# limit, and the cost of a step does not grow with it.
+
+
 def postorder(u):
-    if isinstance(u, node):
-        for v in u:
-            for t in postorder(v):
-                yield t
-        yield u  # returns only traversible objects
+    """Yield the nodes of tree u, children before parents"""
+    if not isinstance(u, node):
+        return
+    stack = [(u, iter(u))]
+    while stack:
+        v, children = stack[-1]
+        for w in children:
+            if isinstance(w, node):
+                stack.append((w, iter(w)))
+                break
+        else:
+            stack.pop()
+            yield v
+
+
+def walk(u, pre=None, post=None):
+    """
+    Visit the nodes of tree u depth first.  pre(v) is called
+    before the children of v, which are skipped if it returns
+    False; post(v) is called after them.
+    """
+    if not isinstance(u, node):
+        return
+    if pre and pre(u) is False:
+        return
+    stack = [(u, iter(u))]
+    while stack:
+        v, children = stack[-1]
+        for w in children:
+            if isinstance(w, node) and not (pre and pre(w) is False):
+                stack.append((w, iter(w)))
+                break
+        else:
+            stack.pop()
+            if post:
+                post(v)
+
+
+def transform(u, f):
+    """
+    Rewrite tree u in place, bottom up.  f is called for each
+    node, after its children, and returns the node itself or
+    its replacement, which is stored into the parent.  Returns
+    the replacement of u.
+    """
+    if not isinstance(u, node):
+        return u
+    root = [u]
+    stack = [(root, 0, u, children(u))]
+    while stack:
+        parent, k, v, it = stack[-1]
+        for i, w in it:
+            if isinstance(w, node):
+                stack.append((v, i, w, children(w)))
+                break
+        else:
+            stack.pop()
+            w = f(v)
+            if w is not v:
+                parent[k] = w
+    return root[0]
+
+
+def children(u):
+    # namedtuple nodes are immutable, and are not descended
+    return iter(()) if isinstance(u, tuple) else enumerate(u)
 
 
 def extend(cls):
@@ -61,39 +120,6 @@ def exceptions(f):
 
 
 class node(object):
-    def become(self, other):
-        class Wrapper(self.__class__):
-            def __copy__(self):
-                other = object.__getattribute__(self, "other")
-                return copy.copy(other)
-
-            def __getattribute__(self, name):
-                other = object.__getattribute__(self, "other")
-                return getattr(other, name)
-
-            def __setattr__(self, name, value):
-                other = object.__getattribute__(self, "other")
-                return setattr(other, name, value)
-
-            def __iter__(self):
-                other = object.__getattribute__(self, "other")
-                return iter(other)
-
-            # def __hash__(self):
-            #    other = object.__getattribute__(self,"other")
-            #    return id(other)
-            def __repr__(self):
-                other = object.__getattribute__(self, "other")
-                return repr(other)
-
-            def __len__(self):
-                other = object.__getattribute__(self, "other")
-                return len(other)
-
-        assert self != other
-        self.other = other
-        self.__class__ = Wrapper
-
     def _type(self):
         raise AttributeError("_type")
 
@@ -155,7 +181,8 @@ class number(atom, recordtype("number", "value lineno lexpos", default=None)):
 
 
 class ident(
-    atom, recordtype("ident", "name lineno column lexpos defs props init", default=None)
+    atom,
+    recordtype("ident", "name lineno column lexpos defs props init vtype", default=None),
 ):
     def __str__(self):
         return self.name
@@ -187,9 +214,12 @@ class stmt(node):
 #                               str(self.args))
 
 
-class let(stmt, recordtype("let", "ret args lineno lexpos nargout", default=None)):
+class let(
+    stmt, recordtype("let", "ret args lineno lexpos nargout alias", default=None)
+):
     """Assignment statement, except [x,y]=foo(x,y,z),
-    which is handled by call_stmt."""
+    which is handled by call_stmt.  For x=y, alias is
+    set by resolve.elide_copies if y need not be copied."""
 
     def __str__(self):
         return "%s=%s" % (str(self.ret), str(self.args))
@@ -478,6 +508,13 @@ def is_const(self):
     return True
 
 
+@extend(expr)
+def is_const(self):
+    # -1, a negative literal
+    return self.op == "-" and len(self.args) == 1 and self.args[0].__class__ is number
+
+
+@extend(concat_list)
 @extend(expr_list)
 def is_const(self):
     return all(t.is_const() for t in self)
@@ -20,10 +20,9 @@ with -o .""",
     epilog="""
 Example:
     $ wget ftp://ftp.gnu.org/gnu/octave/octave-4.0.2.tar.gz
-    $ smop -a octave-4.0.2.tar.gz -g '*/scripts/*.m'
-    $ ls -1 *.py | wc
-    $ python -m py_compile *.py
-    $ ls -1 *.pyc | wc
+    $ smop -Z octave-4.0.2.tar.gz -g '*/scripts/*.m' -o octave-py/
+    $ find octave-py -name '*.py' | wc -l
+    $ python -m compileall -q octave-py
 """,
     formatter_class=argparse.RawTextHelpFormatter,
 )
@@ -57,6 +56,41 @@ parser.add_argument(
 discard multiline comments""",
 )
 
+parser.add_argument(
+    "--ast-dir",
+    metavar="DIR",
+    type=str,
+    help="""
+save the parse tree of each file, right after name resolution
+(or parsing, with -R), to DIR/PATH/FILE.ast, where PATH is the
+directory of the file or of the archive member.  DIR is created
+if needed (see smop.serialize).  Together with -B, this makes a
+parse-only pass for analysis tools
+""",
+)
+
+parser.add_argument(
+    "--cache-dir",
+    metavar="DIR",
+    type=str,
+    help="""
+keep translated files in DIR, keyed by the contents of the
+".m" file, the compiler version and the code generation
+options, and reuse them instead of translating unchanged files
+""",
+)
+
+parser.add_argument(
+    "--cache-size",
+    metavar="MB",
+    type=int,
+    default=256,
+    help="""
+limit the size of the --cache-dir, deleting least recently
+used entries (default 256 MB)
+""",
+)
+
 parser.add_argument(
     "-D",
     "--debug",
@@ -83,8 +117,8 @@ parser.add_argument(
     metavar="PATTERN",
     type=str,
     help="""
-Apply unix glob pattern to the input file list or to files. For
-example -g 'octave-4.0.2/*.m""",
+Apply unix glob pattern to the input file list or to the members
+of the archive. For example -g 'octave-4.0.2/*.m'""",
 )
 
 parser.add_argument(
@@ -96,6 +130,30 @@ use it if you plan to concatenate the generated files
 """,
 )
 
+parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="""
+translate only the files changed since the previous run, and
+the files calling functions whose signatures changed.  The
+dependency index is kept in the output directory (-o DIR),
+or in the current directory if -o is not given
+""",
+)
+
+parser.add_argument(
+    "-j",
+    "--jobs",
+    metavar="N",
+    type=int,
+    default=1,
+    help="""
+translate N files in parallel, using a pool of worker
+processes.  Use -j0 to run one worker per CPU.  The output
+order does not depend on N.
+""",
+)
+
 parser.add_argument(
     "-L",
     "--debug-lexer",
@@ -105,6 +163,15 @@ enable built-in debugging tools
 """,
 )
 
+parser.add_argument(
+    "--ply-lexer",
+    action="store_true",
+    help="""
+tokenize with the PLY lexer, instead of the faster one which
+matches the same rules (see smop.lexer.fast)
+""",
+)
+
 parser.add_argument(
     "-N",
     "--no-numbers",
@@ -127,6 +194,11 @@ derived from input file names by replacing ".m" with ".py".  For example,
     $ smop FILE1.m FILE2.m FILE3.m
 
 generates files FILE1.py FILE2.py and FILE3.py
+
+If FILE.py is an existing directory, or its name ends with "/",
+.tar, .tar.gz, .tgz, .tar.bz2, .tar.xz or .zip, each file is
+translated separately and saved there under its own name.  A
+directory is created if needed.  With -Z, member paths are kept.
 """,
 )
 
@@ -139,6 +211,43 @@ enable built-in debugging tools
 """,
 )
 
+parser.add_argument(
+    "--profile",
+    metavar="REPORT",
+    nargs="?",
+    const="smop-profile.json",
+    help="""
+measure the wall time and the peak memory of each stage
+(lex, parse, resolve, infer, vectorize, fold, backend) for
+each file, and count its tokens and parse tree nodes.  The
+report is written to REPORT, as csv if its name ends with
+.csv, otherwise as json (default smop-profile.json), and
+the slowest files are printed
+""",
+)
+
+parser.add_argument(
+    "--profile-dir",
+    metavar="DIR",
+    type=str,
+    help="""
+with --profile, also save the cProfile statistics of each
+stage of each file to DIR/PATH/FILE.STAGE.prof, where PATH is
+the directory of the file or of the archive member.  DIR is
+created if needed
+""",
+)
+
+parser.add_argument(
+    "--profile-top",
+    metavar="N",
+    type=int,
+    default=10,
+    help="""
+with --profile, print the N slowest files (default 10)
+""",
+)
+
 parser.add_argument(
     "-R",
     "--no-resolve",
@@ -168,6 +277,15 @@ test suite.  When disabled, behaves like regular comments
 """,
 )
 
+parser.add_argument(
+    "-W",
+    "--no-vectorize",
+    action="store_true",
+    help="""
+omit loop vectorization
+""",
+)
+
 parser.add_argument(
     "-x",
     "--exclude",
@@ -186,8 +304,11 @@ parser.add_argument(
     "--archive",
     metavar="ARCHIVE.tar",
     help="""
-Read ".m" files from the archive; ignore other files.  Accepted
-format: "tar".  Accepted compression: "gzip", "bz2".
+Read ".m" files from the archive; ignore other files.  The members
+are read into memory, nothing is extracted to disk.  Without -o,
+the translations are written under the member paths, relative to
+the current directory.  Accepted formats: "tar" and "zip".
+Accepted compression: "gzip", "bz2", "xz".
 """,
 )
 
@@ -196,7 +317,6 @@ args = parser.parse_args(namespace=sys.modules[__name__])
 
 xfiles = args.exclude.split(",") if args.exclude else []
 debug = args.debug.split(":") if args.debug else []
-filename = ""
 
 
 def foo():
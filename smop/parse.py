@@ -1,6 +1,7 @@
 # SMOP compiler -- Simple Matlab/Octave to Python compiler
 # Copyright 2011-2016 Victor Leikehman
 
+import os
 from ply import yacc
 from . import lexer
 from .lexer import tokens, raise_exception
@@ -839,17 +840,26 @@ def p_error(p):
     raise_exception(SyntaxError, ('Unexpected "%s" (parser)' % p.value), new_lexer)
 
 
-parser = yacc.yacc(start="top")
+# The tables are read from parsetab.pickle, which is shipped with
+# the package; unpickling them is much faster than importing a
+# parsetab module.  PLY stamps the tables with a signature of the
+# grammar, and regenerates them if the grammar has changed.
+parser = yacc.yacc(
+    start="top",
+    debug=False,
+    picklefile=os.path.join(os.path.dirname(__file__), "parsetab.pickle"),
+)
 
 
 @exceptions
-def parse(buf):
+def parse(buf, filename=None):
     if "P" in options.debug:
         import pdb
 
         pdb.set_trace()
     global new_lexer  # used in main.main()
     new_lexer = lexer.new()
+    new_lexer.filename = filename  # reported in syntax errors
     p = parser.parse(buf, tracking=1, debug=options.debug_parser, lexer=new_lexer)
 
     if "P" in options.debug:
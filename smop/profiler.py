@@ -0,0 +1,161 @@
+# SMOP -- Simple Matlab/Octave to Python compiler
+# Copyright 2011-2016 Victor Leikehman
+"""
+Per-file, per-stage profile, for --profile.
+
+translate() runs each stage of the pipeline under stage(),
+which records the wall time of the stage and the peak of the
+memory allocated while it runs, and with --profile-dir, dumps
+the cProfile statistics of the stage.  The lexer is run once
+more on its own, to count the tokens and to time the lexing;
+the time of the parse stage includes the lexing it drives.
+
+Memory is measured with tracemalloc, which slows everything
+down.  The times are comparable to each other, not to those
+of a run without --profile.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import cProfile
+import contextlib
+import tracemalloc
+from os.path import splitext
+
+from . import options
+from . import lexer
+from . import archive
+
+stages = ("lex", "parse", "resolve", "infer", "vectorize", "fold", "backend")
+
+note = "lex is a separate run of the lexer, not counted in the total; parse includes lexing"
+
+
+def record(filename):
+    """A new profile record of filename, or None without --profile"""
+    if not options.profile:
+        return None
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return {
+        "file": filename,
+        "tokens": None,
+        "nodes": None,
+        "time": 0.0,
+        "memory": 0,
+        "cached": False,
+        "error": False,
+        "stages": {},
+    }
+
+
+def stage(r, name):
+    """Context manager measuring stage name into record r"""
+    if r is None:
+        return contextlib.nullcontext()
+    return measure(r, name)
+
+
+def stats_path(filename, name):
+    """
+    DIR/PATH/FILE.name.prof, where PATH is the directory of
+    filename, so that files of different directories don't
+    clash.  The directories are created.
+    """
+    f = "%s.%s.prof" % (splitext(archive.output_name(filename))[0], name)
+    path = os.path.join(options.profile_dir, *f.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+@contextlib.contextmanager
+def measure(r, name):
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    prof = None
+    if options.profile_dir:
+        prof = cProfile.Profile()
+        prof.enable()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if prof:
+            prof.disable()
+            prof.dump_stats(stats_path(r["file"], name))
+        peak = tracemalloc.get_traced_memory()[1] - base
+        r["stages"][name] = {"time": elapsed, "memory": peak}
+        if name != "lex":  # lexed again by the parser
+            r["time"] += elapsed
+        r["memory"] = max(r["memory"], peak)
+
+
+def count_tokens(r, buf, filename):
+    """Lex buf by itself, into record r"""
+    if r is None:
+        return
+    lexer.new()  # the first call compiles the lexer
+    with measure(r, "lex"):
+        lx = lexer.new()
+        lx.filename = filename
+        lx.input(buf)
+        try:
+            r["tokens"] = sum(1 for tok in lx)
+        except Exception:
+            r["error"] = True
+
+
+def write(records, path):
+    """Write the records to path, as csv if it ends with .csv, else json"""
+    with open(path, "w", newline="") as fp:
+        if not path.endswith(".csv"):
+            json.dump({"stages": stages, "note": note, "files": records}, fp, indent=1)
+            fp.write("\n")
+            return
+        w = csv.writer(fp)
+        w.writerow(
+            ["file", "tokens", "nodes", "time", "memory", "cached", "error"]
+            + ["%s_%s" % (s, k) for s in stages for k in ("time", "memory")]
+        )
+        for r in records:
+            row = [r[k] for k in ("file", "tokens", "nodes", "time", "memory")]
+            row += [int(r["cached"]), int(r["error"])]
+            for s in stages:
+                t = r["stages"].get(s)
+                row += [t["time"], t["memory"]] if t else ["", ""]
+            w.writerow(row)
+
+
+def summary(records, n, fp=sys.stdout):
+    """Print the totals of each stage and the n slowest files"""
+    total = sum(r["time"] for r in records)
+    print("Profile: %d files, %.3f s" % (len(records), total), file=fp)
+    print("  (%s)" % note, file=fp)
+    for s in stages:
+        t = sum(r["stages"][s]["time"] for r in records if s in r["stages"])
+        m = max([r["stages"][s]["memory"] for r in records if s in r["stages"]] or [0])
+        print("  %-10s %9.3f s  %9.1f MB peak" % (s, t, m / 2.0 ** 20), file=fp)
+    slowest = sorted(records, key=lambda r: r["time"], reverse=True)[:n]
+    if slowest:
+        print("Slowest %d files:" % len(slowest), file=fp)
+    for r in slowest:
+        worst = max(
+            (s for s in r["stages"] if s != "lex"),
+            key=lambda s: r["stages"][s]["time"],
+            default=None,
+        )
+        print(
+            "  %9.3f s  %8s tokens  %8s nodes  %-10s %s"
+            % (
+                r["time"],
+                r["tokens"] if r["tokens"] is not None else "-",
+                r["nodes"] if r["nodes"] is not None else "-",
+                worst or ("cached" if r["cached"] else "-"),
+                r["file"],
+            ),
+            file=fp,
+        )
@@ -0,0 +1,192 @@
+# SMOP compiler runtime support library
+# Copyright 2011-2016 Victor Leikehman
+"""
+Reductions along a dimension, for libsmop: max, min, sum,
+mean, prod, cumsum, cumprod, any and all, with the semantics
+of matlab.
+
+The dimension defaults to the first non-singleton one, so
+that a vector reduces to a scalar and a matrix to a row.  A
+dimension beyond the last is a singleton, and "all" reduces
+the whole array.  Like matlab, sum([]) is 0, prod([]) is 1,
+mean([]) is NaN, any([]) is false and all([]) is true.
+
+max and min skip NaNs unless given "includenan", and return
+NaN only where all the elements are NaN.  Their values and
+indices come from a single argmax or argmin over the data;
+only the columns whose result is NaN are looked at again.
+sum, mean and prod propagate NaNs unless given "omitnan",
+and any and all ignore them.
+
+The functions take anything numpy.asarray takes, and return
+plain ndarrays of at least two dimensions, which libsmop
+turns into matlabarrays.
+"""
+
+import numpy as np
+
+nan_flags = ("omitnan", "includenan")
+type_flags = ("default", "double", "native")
+
+
+def operand(a):
+    """a as an ndarray of at least two dimensions"""
+    x = np.asarray(a)
+    if x.ndim == 0:
+        return x.reshape(1, 1)
+    if x.ndim == 1:
+        return x.reshape(1, -1)
+    return x
+
+
+def first_dim(shape):
+    """Zero-based first non-singleton dimension of shape"""
+    for k, n in enumerate(shape):
+        if n != 1:
+            return k
+    return 0
+
+
+def prepare(a, dim):
+    """
+    Return (x, k), the operand a and the zero-based axis k to
+    reduce, padding x with singletons up to the dimension dim.
+    """
+    x = operand(a)
+    if dim is None:
+        if x.shape == (0, 0):
+            # [] reduces to a scalar, see sum
+            return x.reshape(0, 1), 0
+        return x, first_dim(x.shape)
+    if dim.__class__ is str:
+        if dim.lower() != "all":
+            raise ValueError("unknown dimension %r" % dim)
+        return x.reshape(-1, 1, order="F"), 0
+    k = np.asarray(dim).item()
+    if k != int(k) or k < 1:
+        raise ValueError("dimension must be a positive integer")
+    k = int(k) - 1
+    if k >= x.ndim:
+        x = x.reshape(x.shape + (1,) * (k + 1 - x.ndim))
+    return x, k
+
+
+def trim(r):
+    """Drop the trailing singletons of r, beyond the second"""
+    n = r.ndim
+    while n > 2 and r.shape[n - 1] == 1:
+        n -= 1
+    return r.reshape(r.shape[:n]) if n < r.ndim else r
+
+
+def flags(args, allowed):
+    """Split args into a dimension and the nan flag"""
+    dim = None
+    nanflag = None
+    for a in args:
+        if a.__class__ is str and a.lower() in nan_flags + type_flags:
+            if a.lower() in nan_flags:
+                if a.lower() not in allowed:
+                    raise ValueError("%s is not supported here" % a)
+                nanflag = a.lower()
+        elif dim is None:
+            dim = a
+        else:
+            raise TypeError("too many arguments")
+    return dim, nanflag
+
+
+def is_empty_arg(b):
+    """True for the [] of max(a,[],dim)"""
+    if b is None:
+        return True
+    if isinstance(b, (list, np.ndarray)):
+        return np.size(b) == 0
+    return False
+
+
+def extremum(a, args, nargout=1, largest=True):
+    """
+    max(a), max(a,[],dim) and [m,i]=max(...), or the same of
+    min if not largest.  max(a,b) is element-wise.
+    """
+    b = args[0] if args else None
+    dim, nanflag = flags(args[1:], nan_flags)
+    if not is_empty_arg(b):
+        if nargout > 1:
+            raise ValueError("two arrays and two outputs")
+        if nanflag == "includenan":
+            f = np.maximum if largest else np.minimum
+        else:
+            f = np.fmax if largest else np.fmin
+        return operand(f(np.asarray(a), np.asarray(b)))
+    x, k = prepare(a, dim)
+    if x.shape[k] == 0:
+        e = np.zeros((0, 0), dtype=x.dtype)
+        return (e, np.zeros((0, 0))) if nargout > 1 else e
+    key = np.abs(x) if np.iscomplexobj(x) else x
+    arg = np.argmax if largest else np.argmin
+    i = arg(key, axis=k)
+    i = np.expand_dims(i, k)
+    v = np.take_along_axis(key, i, k)
+    if key.dtype.kind in "fc" and nanflag != "includenan":
+        # argmax stops at the first NaN
+        bad = np.isnan(v)
+        if bad.any():
+            i = skip_nans(key, i, k, bad, largest)
+    m = np.take_along_axis(x, i, k)
+    if nargout > 1:
+        return trim(m), trim(i + 1)
+    return trim(m)
+
+
+def skip_nans(key, i, k, bad, largest):
+    """Indices of the extremes ignoring NaNs, where i has NaNs"""
+    nans = np.isnan(key)
+    fill = -np.inf if largest else np.inf
+    arg = np.argmax if largest else np.argmin
+    j = np.expand_dims(arg(np.where(nans, fill, key), axis=k), k)
+    # where the extreme is -inf (or inf), NaNs tie with it
+    tied = np.take_along_axis(nans, j, k) & ~nans.all(axis=k, keepdims=True)
+    if tied.any():
+        inf = np.expand_dims(np.argmax((key == fill) & ~nans, axis=k), k)
+        j = np.where(tied, inf, j)
+    # all NaNs: the first one
+    return np.where(bad, j, i)
+
+
+def reduce(name, a, args):
+    """sum, prod, mean, any or all of a, along dim in args"""
+    dim, nanflag = flags(args, nan_flags if name in ("sum", "prod", "mean") else ())
+    x, k = prepare(a, dim)
+    if name in ("any", "all"):
+        if x.dtype.kind in "fc":
+            # NaNs are ignored, which all does already
+            t = (x != 0) & ~np.isnan(x) if name == "any" else x != 0
+        else:
+            t = x
+        f = np.any if name == "any" else np.all
+        return trim(f(t, axis=k, keepdims=True))
+    if x.dtype.kind == "b":
+        x = x.astype(float)
+    omit = nanflag == "omitnan" and x.dtype.kind in "fc"
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if name == "sum":
+            r = (np.nansum if omit else np.sum)(x, axis=k, keepdims=True)
+        elif name == "prod":
+            r = (np.nanprod if omit else np.prod)(x, axis=k, keepdims=True)
+        elif omit:
+            n = np.sum(~np.isnan(x), axis=k, keepdims=True)
+            r = np.nansum(x, axis=k, keepdims=True) / n
+        else:
+            r = np.sum(x, axis=k, keepdims=True) / x.shape[k]
+    return trim(r)
+
+
+def accumulate(name, a, args):
+    """cumsum or cumprod of a, along dim in args"""
+    x, k = prepare(a, flags(args, ())[0])
+    if x.dtype.kind == "b":
+        x = x.astype(float)
+    f = np.cumsum if name == "cumsum" else np.cumprod
+    return trim(f(x, axis=k))
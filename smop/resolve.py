@@ -8,36 +8,49 @@ if i.defs:
 if i.defs is None:
     i is a definition (lhs)
 
-if i.defs == set():
+if i.defs == []:
     i is used but not defined.
     Typical for function calls.
 
 symtab is a temporary variable, which maps
-variable names (strings) to sets of ident
+variable names (strings) to tuples of ident
 instances, which possibly define the variable.
-It is used in if_stmt, for_stmt, and while_stmt.
+The tuples are never changed, so a copy of symtab, taken at
+if_stmt, for_stmt, and while_stmt, is a copy of the dict
+alone.  merge() joins the branches into a join of the two
+tuples, which is flattened when a reference reads it.
+
+A loop body is resolved once, in the symtab of the loop
+head: the definitions before the loop, and those at the end
+of the body, which a dry pass over the body finds first.
+Resolving the body twice instead, at every level of nesting,
+would take time exponential in the depth of the loops.
 """
 
-import copy
-import networkx as nx
 
 from . import node
 from .node import extend
 
 
 def as_networkx(t):
+    """
+    The def-use graph of t, for graphviz and debugging: an
+    edge goes from each reference to each of its definitions.
+    Needs networkx, which resolve itself does not.
+    """
+    import networkx as nx
+
     G = nx.DiGraph()
     for u in node.postorder(t):
         if u.__class__ in (node.ident, node.param):
             uu = "%s_%s_%s" % (u.name, u.lineno, u.column)
-            # label = "%s\\n%s" % (uu, u.props if u.props else "")
-            G.add_node(uu, ident=u)
+            G.add_node(uu, ident=u, label="%s\\n%s" % (uu, u.props))
             if u.defs:
                 for v in u.defs:
                     if v.__class__ is node.ident:
                         vv = "%s_%s_%s" % (v.name, v.lineno, v.column)
                         G.add_node(vv, ident=v)
-                        if u.lexpos < v.lexpos:
+                        if (u.lexpos or 0) < (v.lexpos or 0):
                             G.add_edge(uu, vv, color="red")
                         else:
                             G.add_edge(uu, vv, color="black")
@@ -48,22 +61,140 @@ def resolve(t, symtab=None, fp=None, func_name=None):
     if symtab is None:
         symtab = {}
     do_resolve(t, symtab)
-    G = as_networkx(t)
-    for n in G.nodes():
-        u = G.nodes[n]["ident"]
+    for u in node.postorder(t):
+        if (
+            u.__class__ is node.funcall
+            and u.func_expr.__class__ is node.ident
+            and u.func_expr.defs
+        ):
+            # F(X) where F has definitions is an array reference
+            u.__class__ = node.arrayref
+    classify(t)
+
+
+def classify(t):
+    """
+    Set the props of the idents of t which have none, from
+    the def-use chains: "U" if it both refers to definitions
+    and is one, "D" if it is only a definition, "R" if it only
+    refers to definitions, and "F" if neither -- a function.
+    """
+    idents = {}  # by id, in the order of the tree
+    defined = set()  # ids of the idents some ident refers to
+    refers = {}  # by id of the def lists, which refs share
+    for u in node.postorder(t):
+        if u.__class__ in (node.ident, node.param):
+            idents[id(u)] = u
+            if u.defs and id(u.defs) not in refers:
+                refers[id(u.defs)] = False
+                for v in u.defs:
+                    if v.__class__ is node.ident:
+                        defined.add(id(v))
+                        refers[id(u.defs)] = True
+    for k, u in idents.items():
         if u.props:
-            pass
-        elif G.out_edges(n) and G.in_edges(n):
+            continue
+        r = bool(u.defs) and refers[id(u.defs)]
+        if r and k in defined:
             u.props = "U"  # upd
-            # print u.name, u.lineno, u.column
-        elif G.in_edges(n):
+        elif k in defined:
             u.props = "D"  # def
-        elif G.out_edges(n):
+        elif r:
             u.props = "R"  # ref
         else:
             u.props = "F"  # ???
-        G.nodes[n]["label"] = "%s\\n%s" % (n, u.props)
-    return G
+
+
+def elide_copies(stmt_list):
+    """
+    Escape analysis, must run after resolve.  An assignment x=y
+    is emitted as share(y), so that x and y look like separate
+    arrays when either of them is updated.  If neither the
+    definition of x, nor the definitions of y reaching the
+    assignment, are updated ("U") anywhere in the function,
+    and neither x nor y escapes the function, the assignment
+    is marked as a plain alias.  A name escapes if it is a
+    parameter or a return value, or if it is passed to a
+    function, which may update it, or to anything else than
+    indexing, concatenation, an operator or the right side of
+    an assignment.  Globals may be updated elsewhere, and are
+    never aliased.
+
+    The same goes for x=[1,2,3], a matrix of literals, which
+    the backend builds once as a read-only module constant:
+    unless x is updated or escapes, x is the constant itself.
+
+    Returns a list of (func_name, elided, total) tuples, one
+    per function, where total counts these assignments.
+    """
+    report = []
+    func_name = "__script__"
+    lets = []
+    updates = {}
+    global_names = set()
+    reads = []
+    safe = set()
+    escaped = set()
+
+    def done():
+        elided = 0
+        escaped.update(name for name, i in reads if i not in safe)
+        for u in lets:
+            names = [u.ret.name]
+            defs = set([id(u.ret)])
+            if u.args.__class__ is node.ident:
+                names.append(u.args.name)
+                defs.update(map(id, u.args.defs or []))
+            if escaped.intersection(names) or global_names.intersection(names):
+                continue
+            for v in [v for name in names for v in updates.get(name, [])]:
+                if any(id(w) in defs for w in v.defs or []):
+                    break
+            else:
+                u.alias = True
+                elided += 1
+        if lets:
+            report.append((func_name, elided, len(lets)))
+
+    for stmt in stmt_list:
+        if stmt.__class__ is node.func_stmt:
+            done()
+            func_name = stmt.ident.name
+            lets = []
+            updates = {}
+            global_names = set()
+            reads = []
+            safe = set()
+            escaped = set(v.name for v in stmt.ret if v.__class__ is node.ident)
+            escaped.update(v.name for v in stmt.args if v.__class__ is node.ident)
+            continue
+        for u in node.postorder(stmt):
+            if u.__class__ in (node.arrayref, node.cellarrayref):
+                safe.add(id(u.func_expr))
+            elif u.__class__ is node.expr:
+                safe.update(map(id, u.args))
+            elif u.__class__ is node.matrix and u.args:
+                # concatenation copies
+                rows = u.args[0]
+                for row in [rows] if rows.__class__ is node.expr_list else rows:
+                    safe.update(map(id, row))
+            if u.__class__ is node.let:
+                if u.ret.__class__ is node.ident and (
+                    u.args.__class__ is node.ident
+                    or u.args.__class__ is node.matrix
+                    and u.args.args
+                    and u.args.is_const()
+                ):
+                    lets.append(u)
+                    safe.add(id(u.args))
+            elif u.__class__ is node.ident and u.props == "U":
+                updates.setdefault(u.name, []).append(u)
+            elif u.__class__ is node.ident and u.props == "R":
+                reads.append((u.name, id(u)))
+            elif u.__class__ is node.global_stmt:
+                global_names.update(v.name for v in u.global_list)
+    done()
+    return report
 
 
 def do_resolve(t, symtab):
@@ -71,10 +202,69 @@ def do_resolve(t, symtab):
 
 
 def copy_symtab(symtab):
-    new_symtab = copy.copy(symtab)
-    for k, v in new_symtab.items():
-        new_symtab[k] = copy.copy(v)
-    return new_symtab
+    return dict(symtab)
+
+
+def merge(symtab, other):
+    """Join the definitions of other into symtab"""
+    for k, v in other.items():
+        w = symtab.get(k)
+        if w is None:
+            symtab[k] = v
+        elif w is not v:
+            symtab[k] = join((w, v))
+
+
+class join(tuple):
+    """Definitions from either of two symtab entries"""
+
+    flat = None
+
+    def definitions(self):
+        """
+        The distinct definitions, flattened once.  The list is
+        shared by the references reading it, and never changed.
+        """
+        if self.flat is None:
+            seen = set()
+            defs = []
+            stack = [self]
+            while stack:
+                d = stack.pop()
+                if d.__class__ is join and d.flat is None:
+                    stack.extend(reversed(d))
+                    continue
+                for u in d.flat if d.__class__ is join else d:
+                    if id(u) not in seen:
+                        seen.add(id(u))
+                        defs.append(u)
+            self.flat = defs
+        return self.flat
+
+
+# nonzero during dry passes, which only update symtab
+dry = 0
+
+
+def resolve_loop(stmt_list, symtab, cond_expr=None):
+    """
+    Resolve the body of a loop, leaving in symtab the
+    definitions at the end of the last iteration.
+    """
+    global dry
+    if not dry:
+        head = copy_symtab(symtab)
+        dry += 1
+        try:
+            if cond_expr:
+                cond_expr._resolve(head)
+            stmt_list._resolve(head)
+        finally:
+            dry -= 1
+        merge(symtab, head)
+    if cond_expr:
+        cond_expr._resolve(symtab)
+    stmt_list._resolve(symtab)
 
 
 @extend(node.arrayref)
@@ -109,11 +299,9 @@ def _resolve(self, symtab):
     symtab_copy = copy_symtab(symtab)
     self.ident._lhs_resolve(symtab)
     self.expr._resolve(symtab)
-    self.stmt_list._resolve(symtab)
-    self.stmt_list._resolve(symtab)  # 2nd time, intentionally
+    resolve_loop(self.stmt_list, symtab)
     # Handle the case where FOR loop is not executed
-    for k, v in symtab_copy.items():
-        symtab.setdefault(k, []).append(v)
+    merge(symtab, symtab_copy)
 
 
 @extend(node.func_stmt)
@@ -132,14 +320,6 @@ def _lhs_resolve(self, symtab):
         expr._lhs_resolve(symtab)
 
 
-@extend(node.global_list)
-@extend(node.concat_list)
-@extend(node.expr_list)
-def _resolve(self, symtab):
-    for expr in self:
-        expr._resolve(symtab)
-
-
 @extend(node.global_stmt)
 def _resolve(self, symtab):
     self.global_list._lhs_resolve(symtab)
@@ -147,7 +327,7 @@ def _resolve(self, symtab):
 
 @extend(node.ident)
 def _lhs_resolve(self, symtab):
-    symtab[self.name] = [self]
+    symtab[self.name] = (self,)
 
 
 @extend(node.if_stmt)
@@ -157,8 +337,7 @@ def _resolve(self, symtab):
     self.then_stmt._resolve(symtab)
     if self.else_stmt:
         self.else_stmt._resolve(symtab_copy)
-    for k, v in symtab_copy.items():
-        symtab.setdefault(k, []).append(v)
+    merge(symtab, symtab_copy)
 
 
 @extend(node.let)
@@ -195,32 +374,49 @@ def _resolve(self, symtab):
 
 @extend(node.ident)
 def _resolve(self, symtab):
+    if dry:
+        return
     if self.defs is None:
         self.defs = []
-    try:
-        self.defs += symtab[self.name]
-    except KeyError:
-        # defs == set() means name used, but not defined
+    # defs == [] means name used, but not defined
+    v = symtab.get(self.name)
+    if v.__class__ is join:
+        v = v.definitions()
+    if not v:
         pass
+    elif not self.defs:
+        self.defs = v if v.__class__ is list else list(v)
+    else:
+        ids = set(map(id, self.defs))
+        self.defs = self.defs + [d for d in v if id(d) not in ids]
+
+
+# Expressions are resolved without recursion, which deeply
+# nested ones would overflow: the idents are resolved left to
+# right, in the order of evaluation.  Statements met on the
+# way (a let in an expr_stmt), and setfield, resolve
+# themselves.
+expressions = (node.expr, node.expr_list, node.concat_list, node.global_list, node.funcall)
 
 
 @extend(node.arrayref)
 @extend(node.cellarrayref)
 @extend(node.funcall)
-def _resolve(self, symtab):
-    # Matlab does not allow foo(bar)(bzz), so func_expr is usually
-    # an ident, though it may be a field or a dot expression.
-    if self.func_expr:
-        self.func_expr._resolve(symtab)
-    self.args._resolve(symtab)
-    # if self.ret:
-    #    self.ret._lhs_resolve(symtab)
-
-
 @extend(node.expr)
+@extend(node.global_list)
+@extend(node.concat_list)
+@extend(node.expr_list)
 def _resolve(self, symtab):
-    for expr in self.args:
-        expr._resolve(symtab)
+    def pre(u):
+        if u.__class__ is node.ident:
+            u._resolve(symtab)
+            return False
+        if isinstance(u, expressions) and u.__class__ is not node.setfield:
+            return True
+        u._resolve(symtab)
+        return False
+
+    node.walk(self, pre)
 
 
 @extend(node.number)
@@ -256,13 +452,9 @@ def _resolve(self, symtab):
 @extend(node.while_stmt)
 def _resolve(self, symtab):
     symtab_copy = copy_symtab(symtab)
-    self.cond_expr._resolve(symtab)
-    self.stmt_list._resolve(symtab)
-    self.cond_expr._resolve(symtab)
-    self.stmt_list._resolve(symtab)
+    resolve_loop(self.stmt_list, symtab, self.cond_expr)
     # Handle the case where WHILE loop is not executed
-    for k, v in symtab_copy.items():
-        symtab.setdefault(k, []).append(v)
+    merge(symtab, symtab_copy)
 
 
 @extend(node.function)
@@ -0,0 +1,72 @@
+# SMOP -- Simple Matlab/Octave to Python compiler
+# Copyright 2011-2016 Victor Leikehman
+"""
+Binary format for parse trees.
+
+A stmt_list returned by parse.parse, either before or after
+resolve, may be saved with dump() and restored with load(),
+so that resolve, backend, callgraph and the graphviz tools
+can run on it without lexing and parsing the source again.
+
+The format is a header followed by a zlib-compressed pickle
+of the tree:
+
+    SMOPAST <version> <protocol>\\n<zlib data>
+
+Trees written by a different version of smop are rejected,
+because the node classes may have changed in between.
+"""
+
+import sys
+import zlib
+import pickle
+
+from . import node
+from . import version
+
+magic = b"SMOPAST"
+protocol = pickle.HIGHEST_PROTOCOL
+
+
+def header():
+    return b"%s %s %d\n" % (magic, version.__version__.encode(), protocol)
+
+
+def dumps(t, level=6):
+    """Return the bytes representing the tree t"""
+    assert isinstance(t, node.node), t.__class__
+    # ident.defs chains make the tree as deep as the longest
+    # def-use chain, which may exceed the default limit
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 100000))
+    try:
+        data = pickle.dumps(t, protocol)
+    finally:
+        sys.setrecursionlimit(limit)
+    return header() + zlib.compress(data, level)
+
+
+def loads(s):
+    """Return the tree represented by the bytes s"""
+    head, sep, data = s.partition(b"\n")
+    if not sep or not head.startswith(magic + b" "):
+        raise ValueError("Not a smop parse tree")
+    if head + sep != header():
+        raise ValueError(
+            "Parse tree written by %s, expected %s"
+            % (head.decode(errors="replace"), header().decode().strip())
+        )
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 100000))
+    try:
+        return pickle.loads(zlib.decompress(data))
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+def dump(t, fp):
+    fp.write(dumps(t))
+
+
+def load(fp):
+    return loads(fp.read())
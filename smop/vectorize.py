@@ -0,0 +1,339 @@
+# SMOP -- Simple Matlab/Octave to Python compiler
+# Copyright 2011-2016 Victor Leikehman
+"""
+Loop vectorization.
+
+Runs after resolve and infer.  A for loop over a colon range,
+
+    for i = 1:n
+      y(i) = a * x(i) + b(i);
+    end
+
+whose body is a sequence of element-wise updates, each of
+them indexed by the loop variable alone, is replaced by the
+same statements applied to the whole range:
+
+    y(1:n) = a .* x(1:n) + b(1:n);
+
+This is safe when there are no loop-carried dependencies:
+every array updated in the loop is read only at the element
+updated in the same iteration, and the loop variable is not
+used after the loop.  Statement by statement evaluation then
+computes the same values as the loop.  Loops which don't
+pass these checks are left alone.
+
+Each value of the rhs must be a scalar for the scalar loop
+to work, so operands which do not depend on the loop variable
+must be scalars in the vector code, too.  And x(1:n) is a row
+or a column like x, so x(1:n) + b(1:n) of a row x and a column
+b is a matrix: the arrays indexed in the rhs must have the same
+orientation.  Unless infer knows all this, the vector statements
+are guarded by a run-time check, and the original loop is kept
+as the fallback.  So is the case of an empty range, over which
+the loop reads none of the operands:
+
+    if 1 <= n && isscalar(a) && iscolumn(b) == iscolumn(x):
+        y[arange(1,n)]=multiply(a,x[arange(1,n)]) + b[arange(1,n)]
+    else:
+        for i in arange(1,n).reshape(-1):
+            ...
+"""
+
+import copy
+
+from . import node
+from . import infer
+
+# element-wise operators, which work on arrays as they are
+operators = (
+    "+", "-", ".*", "./", ".^", "/", "^", "parens", "!", "~",
+    "<", "<=", ">", ">=", "==", "~=", "!=", "&", "|",
+)
+
+
+class not_vectorizable(Exception):
+    pass
+
+
+def vectorize(stmt_list):
+    """
+    Vectorize the loops of stmt_list, which must have been
+    resolved and typed.  Returns the number of loops replaced.
+    """
+    refs = {}
+    for u in node.postorder(stmt_list):
+        if u.__class__ is node.ident:
+            for d in infer.flat_defs(u):
+                refs[id(d)] = refs.get(id(d), 0) + 1
+    count = 0
+    for s in [u for u in node.postorder(stmt_list) if u.__class__ is node.stmt_list]:
+        for k in reversed(range(len(s))):
+            if s[k].__class__ is node.for_stmt:
+                try:
+                    s[k : k + 1] = loop(s[k], refs)
+                    count += 1
+                except not_vectorizable:
+                    pass
+    return count
+
+
+def body(stmt):
+    """The let statements of the body of loop stmt"""
+    lets = []
+    for t in stmt.stmt_list:
+        if t.__class__ in (node.comment_stmt, node.null_stmt):
+            continue
+        if (
+            t.__class__ is node.expr_stmt
+            and isinstance(t.expr, node.expr_list)
+            and len(t.expr) == 1
+        ):
+            t = t.expr[0]
+        if t.__class__ is not node.let:
+            raise not_vectorizable
+        lets.append(t)
+    if not lets:
+        raise not_vectorizable
+    return lets
+
+
+def indexed(u, i):
+    """True if u is an array reference a(i)"""
+    return (
+        u.__class__ is node.arrayref
+        and u.func_expr.__class__ is node.ident
+        and len(u.args) == 1
+        and u.args[0].__class__ is node.ident
+        and u.args[0].name == i
+    )
+
+
+def loop(stmt, refs):
+    """
+    Return the statements replacing for loop stmt, or raise
+    not_vectorizable.
+    """
+    i = stmt.ident.name
+    r = stmt.expr
+    if r.__class__ is not node.expr or r.op != ":" or len(r.args) < 2:
+        raise not_vectorizable
+    lets = body(stmt)
+    updated = set()
+    for t in lets:
+        if not indexed(t.ret, i):
+            raise not_vectorizable
+        updated.add(t.ret.func_expr.name)
+    # the loop variable is not used after the loop, nor are
+    # the arrays read at other elements than those updated
+    elements = set(
+        id(u.func_expr) for t in lets for u in node.postorder(t) if indexed(u, i)
+    )
+    uses = 0
+    for t in lets:
+        for u in node.postorder(t):
+            if u.__class__ is node.ident:
+                if u.name == i:
+                    uses += 1
+                elif u.name in updated and id(u) not in elements:
+                    raise not_vectorizable
+    if refs.get(id(stmt.ident), 0) > uses:
+        raise not_vectorizable
+    for u in node.postorder(r):
+        if u.__class__ is node.ident and (u.name in updated or u.name == i):
+            raise not_vectorizable
+    checks = oriented(lets, i)
+    guards = []
+    stmts = node.stmt_list()
+    for t in lets:
+        stmts.append(
+            node.let(
+                ret=node.arrayref(
+                    func_expr=fresh(t.ret.func_expr),
+                    args=node.expr_list([fresh(r)]),
+                ),
+                args=vector(t.args, i, r, guards),
+                lineno=t.lineno,
+                lexpos=t.lexpos,
+            )
+        )
+    checks[:0] = [call("isscalar", g) for g in guards]
+    test = nonempty(r)
+    if test is not None:
+        # first, for the other checks read the operands, too
+        checks.insert(0, test)
+    if not checks:
+        return stmts
+    cond = None
+    for test in checks:
+        cond = test if cond is None else node.expr(
+            op="&&", args=node.expr_list([cond, test])
+        )
+    return [
+        node.if_stmt(
+            cond_expr=cond, then_stmt=stmts, else_stmt=node.stmt_list([stmt])
+        )
+    ]
+
+
+def nonempty(r):
+    """
+    Return the run-time check that range r is not empty, or
+    None if it is known not to be.  Over an empty range, the
+    loop reads none of its operands, which need not even be
+    defined, and the vector statements must not run either.
+    """
+    start, stop = r.args[0], r.args[1]
+    op = "<="
+    if len(r.args) == 3:
+        step = literal(r.args[2])
+        if not step:
+            raise not_vectorizable  # the direction is not known
+        if step < 0:
+            op = ">="
+    a, b = literal(start), literal(stop)
+    if a is not None and b is not None:
+        if a <= b if op == "<=" else a >= b:
+            return None
+        raise not_vectorizable  # never runs
+    return node.expr(op=op, args=node.expr_list([fresh(start), fresh(stop)]))
+
+
+def literal(e):
+    """The value of e, if it is a real number or minus one"""
+    if e.__class__ is node.expr and e.op == "-" and len(e.args) == 1:
+        v = literal(e.args[0])
+        return None if v is None else -v
+    if e.__class__ is node.number and isinstance(e.value, (int, float)):
+        return e.value
+    return None
+
+
+def call(name, a):
+    return node.funcall(
+        func_expr=node.ident(name=name), args=node.expr_list([fresh(a)])
+    )
+
+
+def fresh(e):
+    """
+    A copy of expression e.  The vector statements are built of
+    copies, so that no node has two parents, even where the loop
+    is kept as the fallback.
+    """
+    u = copy.copy(e)
+    for k, v in node.children(u):
+        if isinstance(v, node.node):
+            u[k] = fresh(v)
+    return u
+
+
+def orientation(a):
+    """row or column, if infer knows that a is a vector"""
+    t = infer.typeof(a)
+    if not infer.is_vector(t):
+        return None
+    return "row" if t.shape[0] == 1 else "column"
+
+
+def oriented(lets, i):
+    """
+    Return the run-time checks that the arrays indexed by i in
+    the rhs of each of lets have the same orientation, or raise
+    not_vectorizable if infer knows that they don't.
+    """
+    checks = []
+    seen = set()
+    for t in lets:
+        arrays = {}
+        for u in node.postorder(t.args):
+            if indexed(u, i):
+                arrays.setdefault(u.func_expr.name, u.func_expr)
+        known = set(orientation(a) for a in arrays.values()) - {None}
+        if len(known) > 1:
+            raise not_vectorizable
+        unknown = [a for a in arrays.values() if orientation(a) is None]
+        if len(arrays) < 2 or not unknown:
+            continue
+        if known:
+            name = "iscolumn" if known.pop() == "column" else "isrow"
+            tests = [(a.name, call(name, a)) for a in unknown]
+        else:
+            ref = unknown.pop(0)
+            tests = [
+                (
+                    (a.name, ref.name),
+                    node.expr(
+                        op="==",
+                        args=node.expr_list(
+                            [call("iscolumn", a), call("iscolumn", ref)]
+                        ),
+                    ),
+                )
+                for a in unknown
+            ]
+        for key, test in tests:
+            if key not in seen:
+                seen.add(key)
+                checks.append(test)
+    return checks
+
+
+def vector(e, i, r, guards):
+    """
+    Return e, an element-wise expression of loop variable i,
+    applied to range r instead.  Operands which do not depend
+    on i and are not known to be scalars are added to guards.
+    """
+    # parents before their operands, then built bottom up
+    order = []
+    stack = [e]
+    while stack:
+        u = stack.pop()
+        order.append(u)
+        if u.__class__ is node.expr or u.__class__ is node.funcall:
+            stack.extend(u.args)
+    done = {}
+    for u in reversed(order):
+        done[id(u)] = element(u, i, r, guards, done)
+    guards.sort(key=lambda g: g.lexpos or 0)
+    return done[id(e)]
+
+
+def element(e, i, r, guards, done):
+    """vector of e, whose operands are already in done"""
+    cls = e.__class__
+    if cls in (node.number, node.logical):
+        return fresh(e)
+    if cls is node.ident:
+        if e.name == i:
+            return fresh(r)
+        if not e.defs:
+            if e.name in infer.constants:
+                return fresh(e)
+            raise not_vectorizable  # a function, or undefined
+        if not infer.is_scalar(infer.typeof(e)):
+            if e.name not in [g.name for g in guards]:
+                guards.append(e)
+        return fresh(e)
+    if cls is node.arrayref:
+        if indexed(e, i):
+            return node.arrayref(
+                func_expr=fresh(e.func_expr), args=node.expr_list([fresh(r)])
+            )
+        raise not_vectorizable
+    if cls is node.expr and e.op in operators:
+        return node.expr(op=e.op, args=node.expr_list(done[id(a)] for a in e.args))
+    if cls is node.funcall and e.func_expr.__class__ is node.ident:
+        name = e.func_expr.name
+        if e.func_expr.defs or e.nargout and e.nargout > 1:
+            raise not_vectorizable
+        if name == "dot":
+            # on scalars, the same as multiply
+            name = "multiply"
+        elif name != "multiply" and name not in infer.elementwise:
+            raise not_vectorizable
+        return node.funcall(
+            func_expr=node.ident(name=name),
+            args=node.expr_list(done[id(a)] for a in e.args),
+        )
+    raise not_vectorizable
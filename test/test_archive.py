@@ -0,0 +1,67 @@
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+from smop import archive
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.files = {
+            "pkg/foo.m": b"x = 1;\n",
+            "pkg/private/bar.m": b"y = 2;\n",
+            "pkg/README": b"hello\n",
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def make_tar(self, name, mode):
+        filename = os.path.join(self.dir, name)
+        with tarfile.open(filename, mode) as tf:
+            for k, v in self.files.items():
+                info = tarfile.TarInfo(k)
+                info.size = len(v)
+                tf.addfile(info, io.BytesIO(v))
+        return filename
+
+    def test010(self):
+        """Only .m members are read, from any compression"""
+        for name, mode in [("a.tar", "w"), ("a.tgz", "w:gz"), ("a.tar.xz", "w:xz")]:
+            t = dict(archive.members(self.make_tar(name, mode)))
+            self.assertEqual(sorted(t), ["pkg/foo.m", "pkg/private/bar.m"])
+            self.assertEqual(t["pkg/foo.m"], b"x = 1;\n")
+
+    def test020(self):
+        """Zip archives and glob patterns"""
+        filename = os.path.join(self.dir, "a.zip")
+        with zipfile.ZipFile(filename, "w") as zf:
+            for k, v in self.files.items():
+                zf.writestr(k, v)
+        t = dict(archive.members(filename, "*/private/*"))
+        self.assertEqual(list(t), ["pkg/private/bar.m"])
+
+    def test030(self):
+        """Output names never escape the output directory"""
+        self.assertEqual(archive.output_name("a/b/c.m"), "a/b/c.py")
+        self.assertEqual(archive.output_name("/abs/c.m"), "abs/c.py")
+        self.assertEqual(archive.output_name("../../c.m"), "c.py")
+
+    def test040(self):
+        """Output archives"""
+        filename = os.path.join(self.dir, "out.tar.gz")
+        w = archive.writer(filename)
+        w.write("pkg/foo.m", "x = 1\n")
+        w.close()
+        with tarfile.open(filename) as tf:
+            self.assertEqual(tf.getnames(), ["pkg/foo.py"])
+            self.assertEqual(tf.extractfile("pkg/foo.py").read(), b"x = 1\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from smop import cache
+from smop import options
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test010(self):
+        """Miss, then hit"""
+        k = cache.key(b"x=1;\n", "a.m")
+        self.assertIsNone(cache.get(self.dir, k))
+        cache.put(self.dir, k, "x=1\n")
+        self.assertEqual(cache.get(self.dir, k), "x=1\n")
+
+    def test020(self):
+        """The key depends on the source and on the options"""
+        k = cache.key(b"x=1;\n", "a.m")
+        self.assertNotEqual(k, cache.key(b"x=2;\n", "a.m"))
+        self.assertNotEqual(k, cache.key(b"x=1;\n", "b.m"))
+        save = options.no_comments
+        try:
+            options.no_comments = not save
+            self.assertNotEqual(k, cache.key(b"x=1;\n", "a.m"))
+        finally:
+            options.no_comments = save
+        self.assertEqual(k, cache.key(b"x=1;\n", "a.m"))
+
+    def test030(self):
+        """Least recently used entries are evicted first"""
+        keys = [cache.key(str(i).encode(), "a.m") for i in range(3)]
+        for i, k in enumerate(keys):
+            cache.put(self.dir, k, "x" * 100)
+            os.utime(cache.path(self.dir, k), (i, i))
+        os.utime(cache.path(self.dir, keys[0]), (10, 10))  # recently used
+        self.assertEqual(cache.prune(self.dir, 250), 1)
+        self.assertIsNone(cache.get(self.dir, keys[1]))
+        self.assertIsNotNone(cache.get(self.dir, keys[0]))
+        self.assertIsNotNone(cache.get(self.dir, keys[2]))
+
+    def test040(self):
+        """The key depends on the files of the package"""
+        k = cache.key(b"x=1;\n", "a.m")
+        save = cache.digest
+        try:
+            cache.digest = "0" * 64
+            self.assertNotEqual(k, cache.key(b"x=1;\n", "a.m"))
+        finally:
+            cache.digest = save
+        self.assertEqual(k, cache.key(b"x=1;\n", "a.m"))
+        self.assertEqual(len(cache.fingerprint()), 64)
+
+
+if __name__ == "__main__":
+    unittest.main()
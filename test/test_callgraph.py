@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+from smop import parse
+from smop import resolve
+from smop import callgraph
+
+src = """
+function [a,b] = foo(x, varargin)
+  a = bar(x);
+  b = a + baz;
+end
+function c = bar(y)
+  c = y;
+end
+"""
+
+
+class TestCallgraph(unittest.TestCase):
+    def test010(self):
+        """Defined functions and their signatures, called functions"""
+        t = parse.parse(src)
+        resolve.resolve(t)
+        defines, calls = callgraph.summary(t)
+        self.assertEqual(defines, {"foo": [2, 2, True, False], "bar": [1, 1, False, False]})
+        self.assertEqual(calls, ["baz"])
+
+    def test020(self):
+        """Files depending on changed signatures"""
+        index = {
+            "a.m": {"calls": ["foo"]},
+            "b.m": {"calls": ["bar", "baz"]},
+        }
+        changed = callgraph.changed_signatures(
+            {"foo": [1, 1, False, False], "bar": [1, 1, False, False]},
+            {"foo": [1, 1, False, False], "bar": [2, 1, False, False]},
+        )
+        self.assertEqual(changed, {"bar"})
+        self.assertEqual(callgraph.dependents(index, changed), {"b.m"})
+
+    def test030(self):
+        """The index survives a round trip"""
+        d = tempfile.mkdtemp()
+        try:
+            self.assertEqual(callgraph.load_index(d), {})
+            index = {"a.m": {"key": "k", "defines": {}, "calls": [], "output": None}}
+            callgraph.save_index(d, index)
+            self.assertEqual(callgraph.load_index(d), index)
+        finally:
+            shutil.rmtree(d)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+from smop import parse
+from smop import resolve
+from smop import infer
+from smop import fold
+from smop import backend
+
+src = """
+function y = foo(a, b, n)
+  m = 3;
+  y = zeros(1, n);
+  for i = 1:n
+    y(i) = 2*pi/4 + a.^2 * y(m-1+1) + (b);
+    if i > 1
+      y(i) = y(i) + a/b;
+    end
+  end
+end
+"""
+
+
+def translate(src):
+    t = parse.parse(src)
+    resolve.resolve(t)
+    infer.infer(t)
+    n = fold.fold(t)
+    m = fold.hoist(t)
+    return n, m, backend.backend(t)
+
+
+class TestFold(unittest.TestCase):
+    def test010(self):
+        """Literals are folded, squares multiplied, parens dropped"""
+        n, m, s = translate(src)
+        self.assertIn("1.5707963267948966 + dot(", s)
+        self.assertIn("y[m]", s)
+        self.assertIn("+ b\n", s)
+        self.assertNotIn("a ** 2", s)
+
+    def test020(self):
+        """Invariants are hoisted, but not out of if statements"""
+        n, m, s = translate(src)
+        self.assertEqual(m, 1)
+        self.assertIn("_t1=a * a\n", s)
+        self.assertLess(s.index("_t1="), s.index("for i"))
+        self.assertIn("y[i] + a / b", s)
+        t = src.replace("(b)", "(b) + i")
+        self.assertIn("+ b + i", translate(t)[2])
+
+    def test030(self):
+        """Variables defined in the loop are not invariant"""
+        t = src.replace("m = 3;", "m = 3; z = 0;").replace("(b)", "z * 2")
+        t = t.replace("if i > 1", "z = a * 3;\n    if i > 1")
+        s = translate(t)[2]
+        self.assertIn("_t2=dot(a,3)\n", s)
+        self.assertIn("z=share(_t2)\n", s)
+        self.assertIn("dot(z,2)", s)
+
+    def test040(self):
+        """Nothing which may raise is hoisted out of a loop"""
+        t = """
+function y = f2(a, b, n)
+  y = 0;
+  for i = 1:n
+    y = y + a / b + a ^ 2 + sqrt(a);
+  end
+end
+"""
+        n, m, s = translate(t)
+        self.assertEqual(m, 0)
+        d = {}
+        exec("from smop.libsmop import *\n" + s, d)
+        self.assertEqual(d["f2"](0, 0, 0), 0)
+
+    def test050(self):
+        """Complex literals"""
+        n, m, s = translate("function x = f()\n  x = (3i);\nend\n")
+        self.assertIn("x=3j", s)
+
+    def test060(self):
+        """Nothing is read before a loop which runs zero times"""
+        t = """
+function y = f3(c, n)
+  if c
+    a = 2;
+  end
+  y = 0;
+  for i = 1:n
+    y = y + (a + 1) * i;
+  end
+  k = 1;
+  while k < n
+    k = k + 1;
+  end
+  for j = 1:n
+    try
+      y = y + (a + 1);
+    catch
+      y = -1;
+    end
+  end
+end
+"""
+        n, m, s = translate(t)
+        self.assertEqual(m, 1)
+        self.assertIn("if 1 <= n:\n", s)
+        self.assertLess(s.index("_t1=a + 1"), s.index("for i"))
+        self.assertIn("y=y + (a + 1)", s)
+        d = {}
+        exec("from smop.libsmop import *\n" + s, d)
+        self.assertEqual(d["f3"](0, 0), 0)
+        self.assertEqual(d["f3"](1, 2), 15)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+from smop import parse
+from smop import resolve
+from smop import infer
+from smop import backend
+from smop import node
+
+src = """
+function s = foo(n, x)
+  A = zeros(3, 4);
+  [m, k] = size(A);
+  s = 0;
+  for i = 1:m
+    for j = 1:k
+      A(i, j) = i * j;
+      s = s + A(i, j) * 2;
+    end
+  end
+  v = [1 2 3];
+  t = v(2) + x;
+  y = v';
+end
+"""
+
+
+class TestInfer(unittest.TestCase):
+    def setUp(self):
+        self.t = parse.parse(src)
+        resolve.resolve(self.t)
+        infer.infer(self.t)
+
+    def vtypes(self, name):
+        return [
+            u.vtype
+            for u in node.postorder(self.t)
+            if u.__class__ is node.ident and u.name == name and u.defs is None
+        ]
+
+    def test010(self):
+        """Definitions get the join of their values"""
+        self.assertEqual(self.vtypes("A")[0], infer.vtype("float", (3, 4)))
+        self.assertEqual(self.vtypes("m"), [infer.scalar("int")])
+        self.assertEqual(self.vtypes("i"), [infer.scalar("int")])
+        self.assertEqual(self.vtypes("v"), [infer.vtype("int", (1, 3))])
+        self.assertEqual(self.vtypes("y"), [infer.vtype("int", (3, 1))])
+        self.assertIn(infer.scalar("float"), self.vtypes("s"))
+        self.assertEqual(self.vtypes("t"), [None])  # x is unknown
+
+    def test020(self):
+        """Known arrays are read natively, updates are not"""
+        s = backend.backend(self.t)
+        self.assertIn("A[i,j]=(i * j)", s)
+        self.assertIn("s=s + (A.item(i - 1, j - 1) * 2)", s)
+        self.assertIn("t=v.item(1) + x", s)
+
+    def test030(self):
+        """Maybe scalars, and non-positive indices, are not read with item"""
+        self.assertIsNone(infer.join(infer.scalar("int"), infer.vtype("float", (2, 2))).shape)
+        t = parse.parse(
+            """
+function r = foo(c)
+  if c
+    x = 5;
+  else
+    x = zeros(2, 2);
+  end
+  y = zeros(1, 3);
+  r = x(1, 1) + y(0);
+end
+"""
+        )
+        resolve.resolve(t)
+        infer.infer(t)
+        s = backend.backend(t)
+        self.assertIn("x[1,1]", s)
+        self.assertIn("y[0]", s)
+        self.assertNotIn("item", s)
+
+    def test040(self):
+        """Only indices known to be positive are read with item"""
+        t = parse.parse(
+            """
+function r = foo(n)
+  b = zeros(3, 3);
+  j = n - 1;
+  r = b(j, 1);
+  for i = 1:n
+    r = r + b(i, 1) + b(i + 1, 2) + b(i - 1, 3);
+  end
+  for k = 0:n
+    r = r + b(k, 1);
+  end
+  b(1, 2, 3) = 1;
+end
+"""
+        )
+        resolve.resolve(t)
+        infer.infer(t)
+        s = backend.backend(t)
+        self.assertIn("r=b[j,1]", s)
+        self.assertIn("b.item(i - 1, 0)", s)
+        self.assertIn("b.item((i + 1) - 1, 1)", s)
+        self.assertIn("b[i - 1,3]", s)
+        self.assertIn("b[k,1]", s)
+        b = [u for u in node.postorder(t) if u.__class__ is node.ident and u.name == "b"]
+        self.assertEqual(b[-1].vtype, infer.vtype("float", (None, None, None)))
+
+
+if __name__ == "__main__":
+    unittest.main()
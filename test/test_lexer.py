@@ -1,5 +1,8 @@
+import os
+import glob
 import unittest
 from smop import lexer
+from smop import options
 
 
 class TestLexer(unittest.TestCase):
@@ -210,6 +213,59 @@ world"'''
         t = [tok.type for tok in self.lexer]
         self.assertEqual("SEMI", t[6])
 
+    def test170(self):
+        "lexers returned by new() do not share state"
+        self.lexer.input("[a (b")
+        t = [tok.type for tok in self.lexer]
+        other = lexer.new()
+        other.input("end")
+        self.assertEqual(self.lexer.brackets, 1)
+        self.assertEqual(other.brackets + other.parens, 0)
+        self.assertEqual(other.lexstate, "INITIAL")
+        self.assertIsNot(other.stack, self.lexer.stack)
+
+    def test180(self):
+        "the prebuilt lextab matches the rules"
+        self.assertIsNotNone(lexer.tables())
+
+    def test190(self):
+        """The fast lexer returns the tokens of the PLY lexer"""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        files = glob.glob(os.path.join(root, "examples", "*.m"))
+        files += glob.glob(os.path.join(root, "benchmark5", "*.m"))
+        self.assertTrue(files)
+        save = options.ply_lexer, options.no_comments
+        try:
+            for f in files:
+                with open(f) as fp:
+                    buf = fp.read()
+                for options.no_comments in (False, True):
+                    options.ply_lexer = True
+                    ply = tokens(buf)
+                    options.ply_lexer = False
+                    self.assertEqual(tokens(buf), ply, f)
+        finally:
+            options.ply_lexer, options.no_comments = save
+
+    def test200(self):
+        """Numbers are converted as by eval"""
+        for s in ["0", "00", "17", "0x1F", "1.", ".5", "1.5e-3", "2E3", "3i", "1.5j", "1e3j"]:
+            self.assertEqual(lexer.number(s), eval(s.replace("i", "j")), s)
+            self.assertIs(type(lexer.number(s)), type(eval(s.replace("i", "j"))), s)
+
+
+def tokens(buf):
+    """(type, value, lineno, lexpos) of the tokens of buf, and the error"""
+    lx = lexer.new()
+    lx.input(buf)
+    result = []
+    try:
+        for tok in lx:
+            result.append((tok.type, tok.value, tok.lineno, tok.lexpos))
+    except SyntaxError as e:
+        result.append(e.args)
+    return result
+
 
 if __name__ == "__main__":
     unittest.main()
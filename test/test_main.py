@@ -0,0 +1,146 @@
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+from smop import options
+from smop import parse
+from smop import serialize
+from smop import node
+from smop.__main__ import main, translate
+
+src = """
+function y = foo(x)
+  y = x + 1;
+end
+"""
+
+
+class TestMain(unittest.TestCase):
+    def test010(self):
+        """The file name is passed down, not kept in options"""
+        self.assertIn("# foo.m:3", translate(src, "foo.m"))
+        self.assertIn("# bar.m:3", translate(src, "bar.m"))
+        self.assertFalse(hasattr(options, "filename"))
+        with self.assertRaises(SyntaxError) as e:
+            parse.parse("x = (1;\n", "baz.m")
+        self.assertEqual(e.exception.filename, "baz.m")
+
+    def test040(self):
+        """Vectorization can be turned off"""
+        t = src.replace("y = x + 1;", "y = zeros(1, 3);\n  for i = 1:3\n    y(i) = x(i);\n  end")
+        self.assertNotIn("for i", translate(t, "foo.m"))
+        options.no_vectorize = True
+        try:
+            self.assertIn("for i", translate(t, "foo.m"))
+        finally:
+            options.no_vectorize = False
+
+    def test050(self):
+        """Loop variables used as arrays are numpy scalars"""
+        t = """
+function y = foo(n)
+  y = 0;
+  for i = 1:n
+    y = y + i' * 2;
+  end
+  for j = 1:n
+    y = y + j;
+  end
+end
+"""
+        s = translate(t, "foo.m")
+        self.assertIn("for i in arange(1,n).reshape(-1):", s)
+        self.assertIn("for j in loop_range(1,n):", s)
+        d = {}
+        exec("from smop.libsmop import *\n" + s, d)
+        self.assertEqual(d["foo"](3), 18)
+
+    def test060(self):
+        """-o DIR/ with files: the base names, not the source paths"""
+        d = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, d)
+        os.makedirs(os.path.join(d, "src", "a"))
+        filename = os.path.join(d, "src", "a", "foo.m")
+        with open(filename, "w") as fp:
+            fp.write(src)
+        saved = options.filelist, options.output
+        try:
+            options.filelist, options.output = [filename], os.path.join(d, "out") + "/"
+            main()
+        finally:
+            options.filelist, options.output = saved
+        self.assertEqual(os.listdir(os.path.join(d, "out")), ["foo.py"])
+
+    def test070(self):
+        """--ast-dir: created, one tree per path, after resolve, cached or not"""
+        d = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, d)
+        t = src.replace("y = x + 1;", "y = 0;\n  for i = 1:3\n    y = y + (x + 1);\n  end")
+        for name in ["a", "b"]:
+            os.makedirs(os.path.join(d, name))
+            with open(os.path.join(d, name, "f.m"), "w") as fp:
+                fp.write(t)
+        saved = (
+            options.filelist, options.output, options.ast_dir, options.cache_dir,
+            os.getcwd(),
+        )
+        try:
+            os.chdir(d)
+            options.filelist = ["a/f.m", "b/f.m"]
+            options.output, options.cache_dir = "out.py", "cache"
+            for ast_dir in ["ast1", "ast2"]:
+                options.ast_dir = ast_dir
+                main()
+        finally:
+            options.filelist, options.output, options.ast_dir = saved[:3]
+            options.cache_dir = saved[3]
+            os.chdir(saved[4])
+        for ast_dir in ["ast1", "ast2"]:
+            for name in ["a", "b"]:
+                with open(os.path.join(d, ast_dir, name, "f.ast"), "rb") as fp:
+                    u = serialize.load(fp)
+                names = [v.name for v in node.postorder(u) if v.__class__ is node.ident]
+                self.assertIn("y", names)
+                self.assertFalse([v for v in names if v.startswith("_t")])
+
+    def run_archive(self, output):
+        """Translate an archive of two foo.m, in a scratch directory"""
+        d = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, d)
+        filename = os.path.join(d, "a.tar.gz")
+        with tarfile.open(filename, "w:gz") as tf:
+            for name in ["pkg/a/foo.m", "pkg/b/foo.m"]:
+                data = src.replace("1", name[4]).encode()
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tf.addfile(info, io.BytesIO(data))
+        saved = options.archive, options.output, os.getcwd()
+        try:
+            options.archive, options.output = filename, output
+            os.chdir(d)
+            main()
+        finally:
+            options.archive, options.output = saved[:2]
+            os.chdir(saved[2])
+        return d
+
+    def test020(self):
+        """-Z with -o DIR/ creates the directory"""
+        d = self.run_archive("out/")
+        for name in ["a", "b"]:
+            with open(os.path.join(d, "out", "pkg", name, "foo.py")) as fp:
+                self.assertIn("x + " + name, fp.read())
+
+    def test030(self):
+        """-Z without -o keeps the member paths"""
+        d = self.run_archive(None)
+        for name in ["a", "b"]:
+            with open(os.path.join(d, "pkg", name, "foo.py")) as fp:
+                self.assertIn("x + " + name, fp.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
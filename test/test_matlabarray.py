@@ -164,6 +164,207 @@ class test_matlabarray(unittest.TestCase):
             isequal(a, [[0, 0, 0, 0], [0, 1, 1, 0], [0, 1, 1, 0], [0, 0, 0, 0]])
         )
 
+    def test120(self):
+        """Scalar reads return numpy scalars"""
+        a = matlabarray([[1, 3], [2, 4]])
+        self.assertIsInstance(a[2, 1], np.integer)
+        self.assertEqual(a[3], 3)
+        self.assertEqual(a[end()], 4)
+        self.assertEqual(a[2, end()], 4)
+
+    def test130(self):
+        """Ranges return views, which are copied when written"""
+        a = matlabarray([[1, 3, 5], [2, 4, 6]])
+        b = a[arange(1, 2), 2:3]
+        self.assertTrue(np.shares_memory(a, b))
+        self.assertTrue(isequal(b, [[3, 5], [4, 6]]))
+        self.assertTrue(isequal(a[:, 2], [[3], [4]]))
+        self.assertTrue(isequal(a[arange(5, 6)], [[5, 6]]))
+        b[1, 1] = 33
+        self.assertEqual(b[1, 1], 33)
+        self.assertEqual(a[1, 2], 3)
+
+    def test140(self):
+        """Boolean masks"""
+        a = matlabarray([[1, 3, 5], [2, 4, 6]])
+        self.assertTrue(isequal(a[a > 3], [[4], [5], [6]]))
+        self.assertTrue(isequal(a[1, a[1, :] > 1], [[3, 5]]))
+
+    def test150(self):
+        """Appending in a loop keeps the exact shape"""
+        a = matlabarray()
+        for i in range(1, 101):
+            a[i] = i
+            self.assertEqual(a.shape, (1, i))
+        self.assertTrue(isequal(a, [list(range(1, 101))]))
+        b = matlabarray([[1], [2]])
+        b[5] = 5
+        self.assertTrue(isequal(b, [[1], [2], [0], [0], [5]]))
+
+    def test160(self):
+        """Growing columns and rows of a matrix"""
+        a = zeros(3, 0)
+        for j in range(1, 5):
+            a[1:3, j] = j
+        self.assertEqual(a.shape, (3, 4))
+        self.assertTrue(a.flags["F_CONTIGUOUS"])
+        self.assertTrue(isequal(a[2, :], [[1, 2, 3, 4]]))
+        a[4, 2] = 9
+        self.assertEqual(a.shape, (4, 4))
+        self.assertTrue(isequal(a[:, 2], [[2], [2], [2], [9]]))
+        self.assertEqual(a[4, 1], 0)
+
+    def test170(self):
+        """Copy-on-write"""
+        a = matlabarray([[1, 2, 3]])
+        b = share(a)
+        c = share(b)
+        self.assertTrue(np.shares_memory(a, b))
+        b[1] = 10
+        self.assertTrue(isequal(a, [[1, 2, 3]]))
+        self.assertTrue(isequal(b, [[10, 2, 3]]))
+        a[4] = 4
+        self.assertTrue(isequal(a, [[1, 2, 3, 4]]))
+        self.assertTrue(isequal(c, [[1, 2, 3]]))
+        self.assertFalse(np.shares_memory(a, c))
+
+    def test180(self):
+        """Colon ranges, iterated lazily"""
+        self.assertEqual(list(loop_range(1, 4.5)), [1, 2, 3, 4])
+        self.assertEqual(list(loop_range(5, 1, -2)), [5, 3, 1])
+        self.assertEqual(list(loop_range(1, 0)), [])
+        self.assertEqual(list(loop_range(1, 3, 0)), [])
+        self.assertIs(type(next(iter(loop_range(1.0, 1e7)))), int)
+        self.assertEqual(list(loop_range(0, 1, 0.1))[-1], 1.0)
+        self.assertEqual(len(list(loop_range(0, 1, 0.1))), 11)
+        self.assertTrue(isequal(arange(0, 1, 0.25), [[0, 0.25, 0.5, 0.75, 1]]))
+        self.assertEqual(list(loop_range(matlabarray([[2]]), np.int64(3))), [2, 3])
+
+    def test190(self):
+        """Concatenation, of blocks and of scalars"""
+        a = matlabarray([[1, 2], [3, 4]])
+        b = concat([[a, vcat(5, 6)], [7, 8, 9]])
+        self.assertTrue(isequal(b, [[1, 2, 5], [3, 4, 6], [7, 8, 9]]))
+        self.assertTrue(b.flags["F_CONTIGUOUS"])
+        self.assertIsInstance(b, matlabarray)
+        self.assertEqual(hcat(1, 2.5, True).shape, (1, 3))
+        self.assertEqual(concat([1, 2, 3]).shape, (1, 3))
+        self.assertEqual(hcat([], a, matlabarray()).shape, (2, 2))
+        self.assertEqual(hcat().shape, (0, 0))
+        self.assertEqual(hcat("ab", "cd"), "abcd")
+        self.assertRaises(ValueError, vcat, hcat(1, 2), 3)
+
+    def test200(self):
+        """find, in column-major order, stopping after n"""
+        a = matlabarray([[0, 3], [5, 0], [0, 7]])
+        self.assertTrue(isequal(find(a), [[2], [4], [6]]))
+        self.assertTrue(isequal(find(a, 2), [[2], [4]]))
+        self.assertTrue(isequal(find(a, 2, "last"), [[4], [6]]))
+        i, j, v = find(a, nargout=3)
+        self.assertTrue(isequal(i, [[2], [1], [3]]))
+        self.assertTrue(isequal(j, [[1], [2], [2]]))
+        self.assertTrue(isequal(v, [[5], [3], [7]]))
+        self.assertTrue(isequal(find(matlabarray([[0, 3, 0, 4]])), [[2, 4]]))
+        x = matlabarray(np.zeros((1, 100000), dtype=bool))
+        x[[7, 50000, 99999]] = True
+        self.assertTrue(isequal(find(x, 1), [[7]]))
+        self.assertTrue(isequal(find(x, 2, "last"), [[50000, 99999]]))
+        self.assertTrue(isequal(find(x, 5), [[7, 50000, 99999]]))
+        self.assertEqual(find(x, 0).size, 0)
+
+    def test210(self):
+        """Reductions along the first non-singleton dimension"""
+        a = matlabarray([[3, np.nan, 1], [np.nan, np.nan, 5], [2, np.nan, -np.inf]])
+        m, i = max(a, nargout=2)
+        np.testing.assert_equal(np.asarray(m), [[3, np.nan, 5]])
+        self.assertTrue(isequal(i, [[1, 1, 2]]))
+        m, i = min(a, [], 2, nargout=2)
+        np.testing.assert_equal(np.asarray(m), [[1], [5], [-np.inf]])
+        self.assertTrue(isequal(i, [[3], [3], [3]]))
+        self.assertEqual(max(matlabarray([[1, 4, 2]])), 4)
+        np.testing.assert_equal(np.asarray(sum(a, "omitnan")), [[5, 0, -np.inf]])
+        self.assertEqual(mean(matlabarray([[1, 2], [3, 4]]), "all"), 2.5)
+        self.assertEqual(sum(matlabarray()), 0)
+        self.assertEqual(prod(matlabarray()), 1)
+        self.assertFalse(any(matlabarray([[np.nan, 0]])))
+        self.assertTrue(isequal(all(matlabarray([[1, 0], [1, 1]])), [[True, False]]))
+        self.assertTrue(isequal(cumsum(matlabarray([[1, 2], [3, 4]]), 2), [[1, 3], [3, 7]]))
+        self.assertIsInstance(sum(matlabarray([[1, 2], [3, 4]])), matlabarray)
+        self.assertTrue(isequal(floor(matlabarray([[1.5, -1.5]])), [[1, -2]]))
+
+    def test220(self):
+        """Strings, on whole char matrices and cell arrays"""
+        m = char(["ab", "cde"])
+        self.assertEqual(m.shape, (2, 3))
+        self.assertEqual(str(m), "ab \ncde")
+        self.assertTrue(np.shares_memory(codes(m), m))
+        self.assertEqual(str(char([104, 105])), "hi")
+        self.assertEqual(str(upper(m)), "AB \nCDE")
+        self.assertTrue(strcmp(m, char(["ab", "cde"])))
+        self.assertFalse(strcmp(m, "ab"))
+        self.assertTrue(strcmp(char("ab"), "ab"))
+        c = cellstr(m)
+        self.assertEqual(c.shape, (1, 2))
+        self.assertTrue(isequal(strcmp(c, "cde"), [[False, True]]))
+        self.assertEqual(strrep(c, "b", "XX").tolist(), [["aXX", "cde"]])
+        self.assertEqual(upper(c).tolist(), [["AB", "CDE"]])
+        self.assertEqual(str(strrep(char("hello"), "l", "L")), "heLLo")
+        self.assertEqual(toupper("x"), "X")
+
+    def test230(self):
+        """Indices below 1 raise, instead of counting from the end"""
+        a = matlabarray([[1, 2, 3]])
+        self.assertRaises(IndexError, a.__getitem__, 0)
+        self.assertRaises(IndexError, a.__getitem__, matlabarray([[0, 1]]))
+        self.assertRaises(IndexError, a.__setitem__, -1, 5)
+
+    def test240(self):
+        """a(1:n)=b takes n elements of b, row or column"""
+        a = zeros(3, 1)
+        a[arange(1, 3)] = matlabarray([[1, 2, 3]])
+        self.assertEqual(a.tolist(), [[1], [2], [3]])
+        a[arange(1, 4)] = matlabarray([[1], [2], [3], [4]])
+        self.assertEqual(a.tolist(), [[1], [2], [3], [4]])
+        self.assertRaises(ValueError, a.__setitem__, arange(1, 2), zeros(3, 1))
+
+    def test250(self):
+        """Growing a shared array, an alias and a constant"""
+        a = zeros(1, 3)
+        b = share(a)
+        b[5] = 9
+        self.assertEqual(b.tolist(), [[0, 0, 0, 0, 9]])
+        self.assertEqual(a.tolist(), [[0, 0, 0]])
+        v = a.alias()
+        a[4] = 1
+        self.assertEqual(a.tolist(), [[0, 0, 0, 1]])
+        self.assertEqual(v.tolist(), [[0, 0, 0]])
+        v[2] = 5
+        v[4] = 2
+        self.assertEqual(v.tolist(), [[0, 5, 0, 2]])
+        k = constant(matlabarray([[1, 2, 3]]))
+        x = share(k)
+        x[5] = 9
+        y = share(x)
+        y[7] = 1
+        self.assertEqual(x.tolist(), [[1, 2, 3, 0, 9]])
+        self.assertEqual(y.tolist(), [[1, 2, 3, 0, 9, 0, 1]])
+        self.assertEqual(k.tolist(), [[1, 2, 3]])
+        self.assertIsNone(x.base)
+
+    def test260(self):
+        """x(end+1)=v appends, to rows, columns and matrices"""
+        x = matlabarray([[1]])
+        for v in range(2, 7):
+            x[end() + 1] = v
+        self.assertEqual(x.tolist(), [[1, 2, 3, 4, 5, 6]])
+        y = matlabarray([[1], [2]])
+        y[end() + 1] = 3
+        self.assertEqual(y.tolist(), [[1], [2], [3]])
+        z = matlabarray([[1, 2], [3, 4]])
+        z[end(), end() + 1] = 5
+        self.assertEqual(z.tolist(), [[1, 2, 0], [3, 4, 5]])
+        self.assertEqual(z[end()], 5)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,75 @@
+import os
+import csv
+import json
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+
+from smop import options
+from smop import profiler
+from smop.__main__ import translate
+
+src = """
+function y = foo(x)
+  y = x + 1;
+end
+"""
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.save = options.profile
+        options.profile = os.path.join(self.dir, "profile.json")
+
+    def tearDown(self):
+        options.profile = self.save
+        tracemalloc.stop()
+        shutil.rmtree(self.dir)
+
+    def test010(self):
+        """Every stage is measured, tokens and nodes counted"""
+        r = profiler.record("foo.m")
+        self.assertIn("x + 1", translate(src, "foo.m", prof=r))
+        self.assertEqual(tuple(r["stages"]), profiler.stages)
+        self.assertGreater(r["tokens"], 10)
+        self.assertGreater(r["nodes"], 10)
+        self.assertGreater(r["time"], 0)
+
+    def test020(self):
+        """json and csv reports"""
+        r = profiler.record("foo.m")
+        translate(src, "foo.m", prof=r)
+        profiler.write([r], options.profile)
+        with open(options.profile) as fp:
+            self.assertEqual(json.load(fp)["files"][0]["tokens"], r["tokens"])
+        path = os.path.join(self.dir, "profile.csv")
+        profiler.write([r], path)
+        with open(path) as fp:
+            rows = list(csv.DictReader(fp))
+        self.assertEqual(rows[0]["file"], "foo.m")
+        self.assertEqual(int(rows[0]["nodes"]), r["nodes"])
+
+    def test030(self):
+        """Lexer errors are recorded"""
+        r = profiler.record("bad.m")
+        profiler.count_tokens(r, "x = 'unterminated\n", "bad.m")
+        self.assertTrue(r["error"])
+
+    def test040(self):
+        """Statistics of same-named files don't clash"""
+        save = options.profile_dir
+        options.profile_dir = os.path.join(self.dir, "stats")
+        try:
+            for name in ["a/foo.m", "b/foo.m"]:
+                translate(src, name, prof=profiler.record(name))
+        finally:
+            options.profile_dir = save
+        for name in ["a", "b"]:
+            path = os.path.join(self.dir, "stats", name, "foo.parse.prof")
+            self.assertTrue(os.path.exists(path), path)
+
+
+if __name__ == "__main__":
+    unittest.main()
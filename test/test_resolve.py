@@ -0,0 +1,147 @@
+import sys
+import unittest
+from smop import node
+from smop import parse
+from smop import resolve
+from smop import backend
+from smop.libsmop import isequal
+
+src = """
+function r = foo(y, z)
+  x = y;
+  w = z;
+  w(2) = 1;
+  for i = 1:3
+    v = x;
+    x(i) = 0;
+  end
+  r = v + w;
+end
+"""
+
+
+class TestResolve(unittest.TestCase):
+    def test010(self):
+        """Copies are elided unless either side is updated or escapes"""
+        t = parse.parse(src)
+        resolve.resolve(t)
+        self.assertEqual(resolve.elide_copies(t), [("foo", 0, 3)])
+        t = parse.parse(src.replace("x(i) = 0", "q = 0"))
+        resolve.resolve(t)
+        self.assertEqual(resolve.elide_copies(t), [("foo", 1, 3)])
+        s = backend.backend(t)
+        self.assertIn("v=x\n", s)
+        self.assertIn("x=share(y)\n", s)  # y is a parameter
+        self.assertIn("w=share(z)\n", s)
+
+    def test020(self):
+        """Expressions deeper than the recursion limit"""
+        n = sys.getrecursionlimit() + 100
+        t = parse.parse("function y = foo(a)\n  y = %s;\nend\n" % "+".join(["a"] * n))
+        resolve.resolve(t)
+        refs = [
+            u
+            for u in node.postorder(t)
+            if u.__class__ is node.ident and u.name == "a" and u.defs
+        ]
+        self.assertEqual(len(refs), n)
+        s = backend.backend(t)
+        self.assertEqual(s.count("a + "), n - 1)
+
+    def test030(self):
+        """Idents are classified without building a graph"""
+        t = parse.parse(src)
+        resolve.resolve(t)
+        props = {}
+        for u in node.postorder(t):
+            if u.__class__ is node.ident:
+                props.setdefault(u.name, set()).add(u.props)
+        self.assertEqual(props["v"], {"D", "R"})
+        self.assertEqual(props["x"], {"D", "R", "U"})
+        self.assertEqual(props["foo"], {"F"})
+        try:
+            import networkx
+        except ImportError:
+            return
+        G = resolve.as_networkx(t)
+        self.assertTrue(G.has_edge("v_10_7", "v_7_5"))
+
+    def test040(self):
+        """Nested loops are resolved once each"""
+        n = 30
+        src = "function r = foo(a)\n  x = 0;\n"
+        for k in range(n):
+            src += "for i%d = 1:a\n  x = x + %d;\n" % (k, k)
+        src += "end\n" * n + "  r = x;\nend\n"
+        t = parse.parse(src)
+        resolve.resolve(t)
+        refs = [
+            u
+            for u in node.postorder(t)
+            if u.__class__ is node.ident and u.name == "x" and u.defs
+        ]
+        # every def of x reaches the outer loop, and the end
+        self.assertEqual(len(refs[0].defs), n + 1)
+        self.assertEqual(len(refs[-1].defs), n + 1)
+
+    def test050(self):
+        """Matrices of literals are module constants, shared if updated"""
+        src = """
+function r = foo(n)
+  r = 0;
+  for i = 1:n
+    a = [1, 261, -522];
+    b = [1 2; 3 4];
+    b(1) = i;
+    c = [5 6];
+    r = r + a(2) + b(1) + sum(c);
+  end
+end
+"""
+        t = parse.parse(src)
+        resolve.resolve(t)
+        self.assertEqual(resolve.elide_copies(t), [("foo", 1, 3)])
+        s = backend.backend(t)
+        self.assertEqual(s.count("constant(hcat("), 2)
+        self.assertIn("a=_k", s)
+        self.assertIn("b=share(_k", s)
+        self.assertIn("c=share(_k", s)
+        d = {}
+        exec("from smop.libsmop import *\n" + s, d)
+        self.assertEqual(d["foo"](3), 3 * 272 + 6)
+        self.assertEqual(d["foo"](3), 3 * 272 + 6)
+
+    def test060(self):
+        """Copies passed to a function, or returned, are kept"""
+        src = """
+function r = foo()
+  y = zeros(1, 3);
+  x = y;
+  g(x);
+  r = y;
+end
+function g(a)
+  a(1) = 5;
+end
+function r = ident(p)
+  r = p;
+end
+function r = bar()
+  a = zeros(1, 3);
+  b = ident(a);
+  b(1) = 5;
+  r = a;
+end
+"""
+        t = parse.parse(src)
+        resolve.resolve(t)
+        report = resolve.elide_copies(t)
+        self.assertEqual(report, [("foo", 0, 2), ("ident", 0, 1), ("bar", 0, 1)])
+        d = {}
+        exec("from smop.libsmop import *\n" + backend.backend(t), d)
+        self.assertTrue(isequal(d["foo"](), [[0, 0, 0]]))
+        self.assertTrue(isequal(d["bar"](), [[0, 0, 0]]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from smop import parse
+from smop import resolve
+from smop import backend
+from smop import serialize
+
+src = """
+function [a,b] = foo(x, y)
+  a = x;
+  for i = 1:y
+    a(i) = a(i) + y';
+  end
+  b = {a, 'hello'};
+end
+"""
+
+
+class TestSerialize(unittest.TestCase):
+    def test010(self):
+        """Loaded trees translate exactly like freshly parsed ones"""
+        t = parse.parse(src)
+        resolve.resolve(t)
+        u = serialize.loads(serialize.dumps(t))
+        self.assertEqual(repr(u), repr(t))
+        self.assertEqual(backend.backend(u), backend.backend(t))
+
+    def test020(self):
+        """Def-use links survive the round trip"""
+        t = parse.parse(src)
+        resolve.resolve(t)
+        u = serialize.loads(serialize.dumps(t))
+        a = u[2].expr[0]  # a = x
+        self.assertIs(a.ret.defs, None)
+        self.assertEqual(a.args.props, "R")
+        self.assertIs(a.args.defs[0], u[1].args[0])
+
+    def test030(self):
+        """Garbage and foreign versions are rejected"""
+        s = serialize.dumps(parse.parse(src))
+        with self.assertRaises(ValueError):
+            serialize.loads(b"hello\nworld")
+        with self.assertRaises(ValueError):
+            serialize.loads(s.replace(serialize.header(), b"SMOPAST 0.0 4\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+import numpy as np
+from smop import parse
+from smop import resolve
+from smop import infer
+from smop import vectorize
+from smop import backend
+from smop import node
+from smop.libsmop import matlabarray
+
+src = """
+function y = foo(a, x, b, n)
+  y = zeros(1, n);
+  for i = 1:n
+    y(i) = a * x(i) + b(i) .* 2 - x(i) / 3;
+  end
+end
+"""
+
+
+def translate(src, enabled=True):
+    t = parse.parse(src)
+    resolve.resolve(t)
+    infer.infer(t)
+    n = vectorize.vectorize(t) if enabled else 0
+    return n, backend.backend(t)
+
+
+def run(s, *args):
+    d = {}
+    exec("from smop.libsmop import *", d)
+    exec(s, d)
+    return d["foo"](*args)
+
+
+class TestVectorize(unittest.TestCase):
+    def test010(self):
+        """Independent updates are vectorized, guarded by isscalar"""
+        n, s = translate(src)
+        self.assertEqual(n, 1)
+        self.assertIn("if 1 <= n and isscalar(a) and iscolumn(b) == iscolumn(x):", s)
+        self.assertIn("y[arange(1,n)]=multiply(a,x[arange(1,n)])", s)
+        self.assertIn("for i in loop_range(1,n):", s)
+        x = matlabarray(np.arange(1.0, 6.0))
+        b = matlabarray(np.ones(5))
+        args = (2.0, x, b, 5)
+        np.testing.assert_allclose(run(s, *args), run(translate(src, 0)[1], *args))
+
+    def test020(self):
+        """Loop-carried dependencies are not vectorized"""
+        for body in [
+            "y(i) = y(i-1) + x(i);",  # another element
+            "y(i) = sum(y) + x(i);",  # the whole array
+            "y(i) = x(i); b = i;",  # not an update
+        ]:
+            t = src.replace("y(i) = a * x(i) + b(i) .* 2 - x(i) / 3;", body)
+            self.assertEqual(translate(t)[0], 0, body)
+        # the loop variable is used after the loop
+        t = src.replace("end\nend", "end\n  y(1) = i;\nend")
+        self.assertEqual(translate(t)[0], 0)
+
+    def test030(self):
+        """Known scalars, and a range known not to be empty, need no guard"""
+        t = src.replace("a * x(i)", "2 * pi * x(i)").replace("b(i)", "x(i)")
+        t = t.replace("1:n", "1:5")
+        n, s = translate(t)
+        self.assertEqual(n, 1)
+        self.assertNotIn("isscalar", s)
+        self.assertNotIn("for i", s)
+
+    def test040(self):
+        """Rows and columns are not added element by element"""
+        t = src.replace("b(i) .* 2 - x(i) / 3", "b(i)")
+        n, s = translate(t)
+        self.assertEqual(n, 1)
+        self.assertIn("isscalar(a) and iscolumn(b) == iscolumn(x)", s)
+        x = matlabarray(np.arange(1.0, 6.0))
+        for b in [np.ones(5), np.ones((5, 1))]:
+            args = (2.0, x, matlabarray(b), 5)
+            np.testing.assert_allclose(run(s, *args), run(translate(t, 0)[1], *args))
+        # known to differ
+        t = t.replace("y = zeros(1, n);", "y = zeros(1, n); x = zeros(1, n); b = zeros(n, 1);")
+        self.assertEqual(translate(t)[0], 0)
+        # known columns, into a row
+        t = t.replace("x = zeros(1, n);", "x = zeros(n, 1);")
+        n, s = translate(t)
+        self.assertEqual(n, 1)
+        self.assertNotIn("iscolumn", s)
+        np.testing.assert_allclose(run(s, *args), run(translate(t, 0)[1], *args))
+
+    def test050(self):
+        """No node is shared, not even the range"""
+
+        def shared(t):
+            seen = set()
+            for u in node.postorder(t):
+                if isinstance(u, node.node):
+                    if id(u) in seen:
+                        yield id(u)
+                    seen.add(id(u))
+
+        t = parse.parse(src)
+        resolve.resolve(t)
+        infer.infer(t)
+        before = set(shared(t))  # the function's ret and args
+        self.assertEqual(vectorize.vectorize(t), 1)
+        self.assertEqual(set(shared(t)), before)
+    def test060(self):
+        """Nothing is read over an empty range"""
+        t = """
+function b = foo(c, n)
+  if c
+    a = 1:n;
+  end
+  b = zeros(1, 0);
+  for i = 1:n
+    b(i) = a(i);
+  end
+end
+"""
+        n, s = translate(t)
+        self.assertEqual(n, 1)
+        self.assertIn("if 1 <= n:", s)
+        self.assertEqual(np.size(run(s, 0, 0)), 0)
+        np.testing.assert_equal(np.asarray(run(s, 1, 3)), [[1, 2, 3]])
+        self.assertEqual(translate(t.replace("1:n", "3:-1:1"))[0], 1)
+        self.assertEqual(translate(t.replace("1:n", "1:n:3"))[0], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()